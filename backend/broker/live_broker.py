@@ -77,10 +77,9 @@ class LiveBroker(Broker):
         if not self._account_library:
             return
             
-        symbols_to_init = [
-            'account_summary', 'portfolio', 'orders', 'fills',
-            f'strategy_{self.strategy_symbol}'
-        ]
+        # strategy_{symbol} tables are created by utils.strategy_table_helpers on the first write
+        # (under their table lock), an empty placeholder written here would race with it
+        symbols_to_init = ['account_summary', 'portfolio', 'orders', 'fills']
         
         for symbol in symbols_to_init:
             try:
@@ -3,6 +3,7 @@ Portfolio Manager for IB Multi-Strategy ATS
 Handles per-strategy position tracking, fills, and portfolio consolidation with ArcticDB
 """
 import asyncio
+import atexit
 import arcticdb as adb
 import numpy as np
 import pandas as pd
@@ -14,7 +15,9 @@ from .log_manager import add_log
 from utils.fx_cache import FXCache
 from utils.position_helpers import create_position_dict, extract_fill_data, calculate_avg_cost, extract_order_data, create_portfolio_row_from_fill
 from utils.persistence_utils import normalize_timestamp_index
-from utils.strategy_table_helpers import start_hourly_snapshot_task, stop_hourly_snapshot_task, update_strategy_cash
+from utils.strategy_table_helpers import start_hourly_snapshot_task, stop_hourly_snapshot_task, update_strategy_cash, load_active_strategies, invalidate_last_equity
+from utils.strategy_table_helpers import append_strategy_rows, flush_cash_buffer, prune_strategy_tables
+from utils.strategy_table_helpers import start_cash_flush_task, stop_cash_flush_task
 from utils.strategy_table_helpers import get_strategy_positions as get_positions_helper, calculate_strategy_equity as calculate_equity_helper, get_strategy_equity_history as get_equity_history_helper
 from .arctic_manager import get_ac, defragment_account_portfolio
 
@@ -71,6 +74,17 @@ class PortfolioManager:
         
         # Background task for hourly strategy positions snapshot
         self._hourly_snapshot_task = None
+        # Background task writing buffered CASH rows once they are due
+        self._cash_flush_task = None
+        
+        # Active strategy symbols from metadata (None = not loaded, invalidated by strategy CRUD)
+        self._active_strategies_cache = None
+        
+        # Last EQUITY snapshot per idle strategy: {strategy: (equity, realized_pnl, currency, written_at)}
+        self._last_equity_cache = {}
+        
+        # Buffered CASH rows must reach ArcticDB even if the app exits without a clean shutdown
+        atexit.register(self.flush_pending_writes)
         
         print("PortfolioManager initialized")
     
@@ -220,6 +234,9 @@ class PortfolioManager:
             # Extract fill details
             fill_data = extract_fill_data(strategy, trade, fill)
             
+            # Strategy table is about to change, next hourly snapshot must recompute equity
+            invalidate_last_equity(self, strategy)
+            
             # Record the fill in ArcticDB
             await self._record_fill(fill_data)
             
@@ -287,11 +304,8 @@ class PortfolioManager:
                 new_position['timestamp'] = pd.to_datetime(new_position['timestamp'])
                 new_position.set_index('timestamp', inplace=True)
                 
-                # Write to ArcticDB
-                try:
-                    self.account_library.append(table_name, new_position, prune_previous_versions=True)
-                except:
-                    self.account_library.write(table_name, new_position, prune_previous_versions=True)
+                # Write to ArcticDB (together with any buffered CASH rows), off the message queue loop
+                await asyncio.to_thread(append_strategy_rows, self, table_name, new_position)
                 return
 
             # Calculate position changes
@@ -417,11 +431,8 @@ class PortfolioManager:
             position_df['timestamp'] = pd.to_datetime(position_df['timestamp'])
             position_df.set_index('timestamp', inplace=True)
             
-            # Write to ArcticDB
-            try:
-                self.account_library.append(table_name, position_df, prune_previous_versions=True)
-            except:
-                self.account_library.write(table_name, position_df, prune_previous_versions=True)
+            # Write to ArcticDB (together with any buffered CASH rows), off the message queue loop
+            await asyncio.to_thread(append_strategy_rows, self, table_name, position_df)
 
         except Exception as e:
             add_log(f"Error saving position to ArcticDB: {e}", "PORTFOLIO", "ERROR")
@@ -580,10 +591,24 @@ class PortfolioManager:
         Clear all portfolio caches:
         - Strategy/symbol position cache (_position_cache)
         - Reconciled positions memory cache (_positions_memory_cache)
+        - Active strategies cache (_active_strategies_cache)
+        - Last snapshotted equity per strategy (_last_equity_cache)
         """
         self._position_cache.clear()
         self._positions_memory_cache = None
         self._positions_cache_timestamp = None
+        self._active_strategies_cache = None
+        self._last_equity_cache.clear()
+    
+    def flush_pending_writes(self):
+        """Write buffered strategy CASH rows to ArcticDB and prune old strategy table versions."""
+        if self.account_library is not None:
+            flush_cash_buffer(self)
+            prune_strategy_tables(self)
+    
+    def invalidate_active_strategies_cache(self):
+        """Force the next snapshot to re-read active strategies from the metadata table."""
+        self._active_strategies_cache = None
     
     async def reconcile_positions(self, ib_client=None, force_refresh: bool = False) -> pd.DataFrame:
         """
@@ -1024,6 +1049,7 @@ class PortfolioManager:
     def start_hourly_snapshots(self):
         """Start the background task for hourly strategy position snapshots"""
         if self._hourly_snapshot_task is None or self._hourly_snapshot_task.done():
+            self._active_strategies_cache = load_active_strategies(self)
             self._hourly_snapshot_task = start_hourly_snapshot_task(self)
             print("Hourly strategy snapshot task started")
     
@@ -1033,3 +1059,14 @@ class PortfolioManager:
             stop_hourly_snapshot_task(self._hourly_snapshot_task)
             self._hourly_snapshot_task = None
             print("Hourly strategy snapshot task stopped")
+    
+    def start_cash_flush(self):
+        """Start the background task writing buffered strategy CASH rows"""
+        if self._cash_flush_task is None or self._cash_flush_task.done():
+            self._cash_flush_task = start_cash_flush_task(self)
+    
+    def stop_cash_flush(self):
+        """Stop the background task writing buffered strategy CASH rows (call flush_pending_writes after)"""
+        if self._cash_flush_task and not self._cash_flush_task.done():
+            stop_cash_flush_task(self._cash_flush_task)
+            self._cash_flush_task = None
@@ -4,14 +4,67 @@ Based on the old project's trademanager.py
 """
 from ib_async import *
 import asyncio
+from copy import copy
 from typing import Optional
 from core.log_manager import add_log
 
+# Order states that mean IB has accepted the order
+ACK_STATUSES = {'PreSubmitted', 'Submitted', 'Filled'}
+
 
 class TradeManager:
     def __init__(self, ib_client, strategy_manager):
         self.ib = ib_client
         self.strategy_manager = strategy_manager
+        # Contracts qualified during this session, keyed by _qualify_key
+        self._qualified = {}
+
+    @staticmethod
+    def _qualify_key(contract):
+        """Cache key for a contract: its conId once known, otherwise its identifying fields."""
+        if contract.conId:
+            return contract.conId
+        return (contract.secType, contract.symbol, contract.localSymbol, contract.lastTradeDateOrContractMonth,
+                contract.strike, contract.right, contract.multiplier, contract.exchange,
+                contract.primaryExchange, contract.currency)
+
+    async def _qualify(self, *contracts):
+        """
+        Qualify contracts in place, skipping the IB round trip for contracts already qualified this session.
+        :param contracts: ib.Contract objects to qualify
+        """
+        pending = []
+        for contract in contracts:
+            cached = self._qualified.get(self._qualify_key(contract))
+            if cached is not None:
+                util.dataclassUpdate(contract, cached)
+            else:
+                pending.append(contract)
+
+        if pending:
+            keys = [self._qualify_key(contract) for contract in pending]
+            await self.ib.qualifyContractsAsync(*pending)
+            for key, contract in zip(keys, pending):
+                if contract.conId:
+                    self._qualified[key] = self._qualified[contract.conId] = copy(contract)
+
+    @staticmethod
+    async def _wait_for_ack(trade, timeout: float = 1.0):
+        """
+        Wait until IB acknowledges the order (or it is done), but at most `timeout` seconds.
+        :param trade: ib.Trade returned by placeOrder
+        :param timeout: upper bound in seconds (the previous fixed sleep)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while trade.orderStatus.status not in ACK_STATUSES and not trade.isDone():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(trade.statusEvent, remaining)
+            except asyncio.TimeoutError:
+                break
 
     async def trade(self, contract, quantity: int, order_type: str = 'MKT', algo: bool = True, 
                     urgency: str = 'Patient', orderRef: str = "", limit: Optional[float] = None, 
@@ -28,8 +81,8 @@ class TradeManager:
         :param useRth: use regular trading hours
         """
         try:
-            # Qualify contract using async method
-            await self.ib.qualifyContractsAsync(contract)
+            # Qualify contract (cached after the first order on it)
+            await self._qualify(contract)
             
             # Create order object
             action = 'BUY' if quantity > 0 else 'SELL'
@@ -60,7 +113,7 @@ class TradeManager:
 
             # Place the order using sync method (placeOrder doesn't have async version)
             trade = self.ib.placeOrder(contract, order)
-            await asyncio.sleep(1)
+            await self._wait_for_ack(trade)
 
             # Notify the strategy manager about the order placement
             # orderRef should be the strategy symbol for proper logging
@@ -89,7 +142,7 @@ class TradeManager:
         """
         try:
             # Qualify contracts
-            await self.ib.qualifyContractsAsync(current_contract, new_contract)
+            await self._qualify(current_contract, new_contract)
 
             # Define quantity based on current position
             portfolio = self.ib.portfolio()
@@ -40,8 +40,9 @@ async def lifespan(app: FastAPI):
     strategy_manager = StrategyManager(arctic_client=ac)
     portfolio_manager = strategy_manager.portfolio_manager
 
-    # Start hourly snapshots
+    # Start hourly snapshots and the periodic CASH buffer flush
     portfolio_manager.start_hourly_snapshots()
+    portfolio_manager.start_cash_flush()
     
     # Inject strategy manager into routes
     set_strategy_manager(strategy_manager)
@@ -62,6 +63,8 @@ async def lifespan(app: FastAPI):
         await strategy_manager.cleanup()
     if portfolio_manager:
         portfolio_manager.stop_hourly_snapshots()
+        portfolio_manager.stop_cash_flush()
+        portfolio_manager.flush_pending_writes()
 
 
 # Create FastAPI app
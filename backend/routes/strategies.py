@@ -1,6 +1,7 @@
 """
 Strategies API routes
 """
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
@@ -13,6 +14,7 @@ from datetime import datetime, timezone
 
 from core.strategy_manager import StrategyManager
 from utils.strategy_table_helpers import initialize_strategy_cash, get_strategy_equity_history, get_strategy_positions
+from utils.strategy_table_helpers import adjust_strategy_cash, delete_strategy_table
 
 # Create router for strategies endpoints
 router = APIRouter(prefix="/api/strategies", tags=["strategies"])
@@ -45,6 +47,12 @@ def set_strategy_manager(sm: StrategyManager):
     global strategy_manager
     strategy_manager = sm
 
+def _invalidate_active_strategies_cache():
+    """Drop the portfolio manager's cached active strategy set after a metadata change."""
+    pm = getattr(strategy_manager, 'portfolio_manager', None) if strategy_manager else None
+    if pm is not None:
+        pm.invalidate_active_strategies_cache()
+
 class StrategyMetadata(BaseModel):
     name: str
     strategy_symbol: str = Field(..., description="Canonical symbol identifier, e.g., SPY")
@@ -358,6 +366,7 @@ async def save_strategy_metadata(payload: StrategyMetadata):
             is_new_strategy = True
 
         lib.write(symbol, updated_df)
+        _invalidate_active_strategies_cache()
         
         if is_new_strategy:
             try:
@@ -447,6 +456,7 @@ async def activate_strategy(strategy_symbol: str):
             raise HTTPException(status_code=404, detail=f"Strategy {sym} not found")
         df.loc[mask, "active"] = True
         lib.write(symbol, df.reset_index(drop=True))
+        _invalidate_active_strategies_cache()
         return {"success": True}
     except HTTPException:
         raise
@@ -472,6 +482,7 @@ async def deactivate_strategy(strategy_symbol: str):
         df.loc[mask, "active"] = False
         df.reset_index(drop=True, inplace=True)
         lib.write(symbol, df)
+        _invalidate_active_strategies_cache()
         return {"success": True}
     except HTTPException:
         raise
@@ -496,10 +507,10 @@ async def delete_strategy(strategy_symbol: str):
             raise HTTPException(status_code=404, detail=f"Strategy {sym} not found")
         df = df[~mask].reset_index(drop=True)
         lib.write(symbol, df)
+        _invalidate_active_strategies_cache()
 
-        # Delete strategy library
-        account_lib = strategy_manager.portfolio_manager.account_id
-        ac.get_library(account_lib).delete(f"strategy_{sym}")
+        # Delete strategy table (and its buffered CASH rows)
+        await asyncio.to_thread(delete_strategy_table, strategy_manager.portfolio_manager, sym)
 
         return {"success": True}
     except HTTPException:
@@ -583,41 +594,22 @@ async def assign_portfolio_strategy(payload: PortfolioAssignmentRequest):
     df.loc[idx, "strategy"] = target_strat
     lib.write("portfolio", df, prune_previous_versions=True)
 
-    # 2. Update Strategy Tables
+    # 2. Update Strategy Tables (through the helpers: buffered fill CASH rows are included)
     cost = float(row['position']) * float(row['averageCost'])
     ts = datetime.now(timezone.utc)
     
     for strat, amount, add_pos in [(target_strat, -cost, True), (old_strat, cost, False)]:
         if not strat or strat in ["", "Discretionary", "Unassigned"] or pd.isna(strat): continue
         
-        tbl = f"strategy_{strat}"
-        # Get current cash
-        cash = 0.0
-        if lib.has_symbol(tbl):
-            sdf = lib.read(tbl).data
-            c_rows = sdf[sdf['asset_class'] == 'CASH']
-            if not c_rows.empty: cash = float(c_rows.iloc[-1]['quantity'])
-            
-        # Create rows
-        new_rows = [{
-            'strategy': strat, 'symbol': row['currency'], 'asset_class': 'CASH', 'exchange': '',
-            'currency': row['currency'], 'quantity': cash + amount, 'avg_cost': 1.0, 'realized_pnl': 0.0, 'timestamp': ts
-        }]
+        position_rows = []
         if add_pos:
-            new_rows.append({
+            position_rows.append({
                 'strategy': strat, 'symbol': row['symbol'], 'asset_class': row['asset_class'],
                 'exchange': row.get('exchange',''), 'currency': row['currency'], 'quantity': float(row['position']),
-                'avg_cost': float(row['averageCost']), 'realized_pnl': 0.0, 'timestamp': ts
+                'avg_cost': float(row['averageCost']), 'realized_pnl': 0.0
             })
-
-        # Write/Append
-        update = pd.DataFrame(new_rows).set_index('timestamp')
-        # Ensure cols
-        for c in ['strategy','symbol','asset_class','exchange','currency','quantity','avg_cost','realized_pnl']:
-            if c not in update: update[c] = "" if c == 'exchange' else 0.0
-        
-        if lib.has_symbol(tbl): lib.append(tbl, update[update.columns], prune_previous_versions=True)
-        else: lib.write(tbl, update[update.columns], prune_previous_versions=True)
+        await asyncio.to_thread(adjust_strategy_cash, strategy_manager.portfolio_manager, strat, amount,
+                                row['currency'], extra_rows=position_rows, timestamp=ts)
 
     strategy_manager.portfolio_manager.clear_cache()
     return {"success": True}
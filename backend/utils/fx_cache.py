@@ -4,7 +4,7 @@ Lightweight FX cache for IB Multi-Strategy ATS.
 - Print-based diagnostics (no add_log).
 - Async-first get_fx_rate() to avoid event-loop issues.
 - IB spot first (if connected), yfinance fallback, default 1.0.
-- TTL-based caching.
+- TTL-based caching, concurrent misses on the same pair share one fetch.
 """
 
 import math
@@ -24,6 +24,10 @@ class FXCache:
         self.ttl = timedelta(minutes=ttl_minutes)
         self.fx_cache: Dict[Tuple[str, str], float] = {}
         self.fx_ts: Dict[Tuple[str, str], datetime] = {}
+        # One lock per pair and event loop: a burst of lookups on a cold pair waits for a single
+        # IB/yfinance fetch. Fills (message queue thread) and snapshots/routes (main loop) run on
+        # different loops, an asyncio.Lock must only be awaited from the loop it belongs to
+        self._pair_locks: Dict[Tuple[asyncio.AbstractEventLoop, Tuple[str, str]], asyncio.Lock] = {}
         print(f"[FX] FXCache initialized (base={self.base}, ttl={ttl_minutes}m)")
 
     def _is_fresh(self, key: Tuple[str, str]) -> bool:
@@ -47,6 +51,19 @@ class FXCache:
             self.fx_ts[key] = datetime.utcnow()
             return 1.0
 
+        lock_key = (asyncio.get_running_loop(), key)
+        lock = self._pair_locks.get(lock_key)
+        if lock is None:
+            lock = self._pair_locks.setdefault(lock_key, asyncio.Lock())
+        async with lock:
+            # Another waiter may have fetched the rate while we were queued
+            if key in self.fx_cache and self._is_fresh(key):
+                return self.fx_cache[key]
+            return await self._fetch_fx_rate(currency, base_currency, ib_client)
+
+    async def _fetch_fx_rate(self, currency: str, base_currency: str, ib_client=None) -> float:
+        """Fetch currency/base_currency from IB, then yfinance, else 1.0, and store it in the cache."""
+        key = (currency, base_currency)
         ib = ib_client if ib_client else self.ib
         
         # 1) IB spot (non-blocking)
@@ -3,9 +3,229 @@ Strategy Table Helpers for IB Multi-Strategy ATS
 Handles background tasks for periodic strategy position snapshots and strategy initialization
 """
 import asyncio
+import logging
+import random
+import threading
+import time
+import numpy as np
 import pandas as pd
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+
+# Per-fill CASH arithmetic is logged at DEBUG level (lazy %-formatting, nothing is formatted when disabled)
+logger = logging.getLogger("core.portfolio")
+
+# Number of strategies processed between cooperative yields in the snapshot loop
+SNAPSHOT_YIELD_EVERY = 10
+
+# Idle strategies (no positions, no writes since their last snapshot) get their unchanged EQUITY row
+# carried forward at most this often, so equity history windows always contain points
+IDLE_EQUITY_INTERVAL = timedelta(days=1)
+
+# CASH rows produced by fills are buffered per strategy table and written together with the
+# next append to that table, or once CASH_FLUSH_N rows / CASH_FLUSH_SECS seconds have piled up
+# (checked on every fill and by cash_flush_task, so a lone fill is not held in memory)
+CASH_FLUSH_N = 20
+CASH_FLUSH_SECS = 5.0
+_cash_buffer: Dict[str, List[dict]] = {}
+_cash_buffer_since: Dict[str, float] = {}
+# Latest CASH row per strategy table (buffered or written), saves the CASH read on every fill
+_last_cash: Dict[str, dict] = {}
+
+# Strategy table appends keep previous versions; old versions are pruned for all touched tables
+# together by the background tasks (every PRUNE_INTERVAL_SECS seconds, after each snapshot cycle)
+# and on shutdown, never on the write path
+PRUNE_INTERVAL_SECS = 60.0
+_unpruned_tables: set = set()
+_last_prune = time.monotonic()
+# Guards the module-level bookkeeping shared by all threads
+# (_cash_buffer, _cash_buffer_since, _unpruned_tables, _last_prune)
+_state_lock = threading.Lock()
+
+# Strategy tables are written from the event loop, the message queue thread (fills) and worker threads
+# (snapshot writes via asyncio.to_thread). ArcticDB does not isolate concurrent writers of one symbol,
+# so every read-modify-write of a strategy table (and of its CASH buffer) holds that table's lock
+_table_locks: Dict[str, threading.RLock] = {}
+_table_locks_guard = threading.Lock()
+
+
+def _table_lock(table_name: str) -> threading.RLock:
+    """Lock serializing all writers of one strategy table (re-entrant: flushes nest inside appends)."""
+    with _table_locks_guard:
+        lock = _table_locks.get(table_name)
+        if lock is None:
+            lock = _table_locks[table_name] = threading.RLock()
+        return lock
+
+
+def _single_row_frame(row: dict, timestamp: datetime) -> pd.DataFrame:
+    """Build a one-row DataFrame indexed by a 'timestamp' DatetimeIndex, column by column."""
+    return pd.DataFrame({k: [v] for k, v in row.items()}, index=pd.DatetimeIndex([timestamp], name='timestamp'))
+
+
+def _take_pending_cash(table_name: str) -> Optional[pd.DataFrame]:
+    """Remove and return the buffered CASH rows of a strategy table as a timestamp-indexed DataFrame."""
+    with _state_lock:
+        rows = _cash_buffer.pop(table_name, None)
+        _cash_buffer_since.pop(table_name, None)
+    if not rows:
+        return None
+    pending_df = pd.DataFrame(rows)
+    pending_df['timestamp'] = pd.to_datetime(pending_df['timestamp'])
+    return pending_df.set_index('timestamp')
+
+
+def _pending_cash_rows(table_name: str) -> List[dict]:
+    """Snapshot of the buffered CASH rows of a strategy table (empty list if none)."""
+    with _state_lock:
+        return list(_cash_buffer.get(table_name, ()))
+
+
+def _cash_flush_due(table_name: str, now: float) -> bool:
+    """True if the CASH buffer of a strategy table holds CASH_FLUSH_N rows or is CASH_FLUSH_SECS old."""
+    with _state_lock:
+        since = _cash_buffer_since.get(table_name)
+        return since is not None and (len(_cash_buffer.get(table_name, ())) >= CASH_FLUSH_N
+                                      or now - since >= CASH_FLUSH_SECS)
+
+
+def _append_in_order(lib, table_name: str, df: pd.DataFrame):
+    """
+    Append df to a strategy table, or create the table if it does not exist (caller holds the table lock).
+    
+    ArcticDB rejects appends starting before the table end. Rows stamped before another writer
+    (a fill during a snapshot cycle) got the lock are moved up to the table end and appended again.
+    
+    Args:
+        lib: ArcticDB account library
+        table_name: Strategy table name (strategy_{strategy_symbol})
+        df: Timestamp-indexed rows, sorted
+    """
+    if not lib.has_symbol(table_name):
+        lib.write(table_name, df, prune_previous_versions=False)
+        return
+    try:
+        lib.append(table_name, df, prune_previous_versions=False)
+    except Exception:
+        end = pd.Timestamp(lib.get_description(table_name).date_range[1])
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None and end.tzinfo is not None:
+            end = end.tz_convert('UTC').tz_localize(None)
+        elif index.tz is not None and end.tzinfo is None:
+            end = end.tz_localize('UTC')
+        if not (index < end).any():
+            raise
+        print(f"[PORTFOLIO WARNING] {(index < end).sum()} row(s) for {table_name} older than the table end, restamped to {end}")
+        df = df.copy()
+        df.index = index.where(index >= end, end)
+        lib.append(table_name, df, prune_previous_versions=False)
+
+
+def append_strategy_rows(portfolio_manager, table_name: str, rows_df: Optional[pd.DataFrame] = None) -> bool:
+    """
+    Append rows to a strategy table together with its buffered CASH rows, in a single ArcticDB call.
+    
+    Every writer of strategy_{strategy_symbol} tables goes through here so buffered CASH rows
+    are always written before newer rows (ArcticDB appends must keep the index sorted).
+    Runs under the table lock; creates the table if it does not exist yet.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        table_name: Strategy table name (strategy_{strategy_symbol})
+        rows_df: Optional timestamp-indexed rows to append after the pending CASH rows
+        
+    Returns:
+        bool: True if anything was written, False otherwise
+    """
+    with _table_lock(table_name):
+        pending_df = _take_pending_cash(table_name)
+        frames = [f for f in (pending_df, rows_df) if f is not None and not f.empty]
+        if not frames:
+            return False
+        combined = pd.concat(frames).sort_index(kind='stable') if len(frames) > 1 else frames[0]
+        
+        def rebuffer():
+            # Keep the CASH rows for the next attempt rather than losing them
+            if pending_df is not None:
+                rows = pending_df.reset_index().to_dict('records')
+                with _state_lock:
+                    _cash_buffer[table_name] = rows + _cash_buffer.get(table_name, [])
+                    _cash_buffer_since.setdefault(table_name, time.monotonic())
+        
+        lib = portfolio_manager.account_library
+        try:
+            # Existence checked under the lock, right before deciding between append and write
+            _append_in_order(lib, table_name, combined)
+        except Exception as e:
+            if pending_df is None or len(frames) == 1:
+                rebuffer()
+                raise
+            # A CASH flush that keeps failing must not block the new rows: write them alone,
+            # the CASH rows stay buffered (and are restamped behind these rows on the next flush)
+            print(f"[PORTFOLIO ERROR] Failed to write buffered CASH rows to {table_name}, appending new rows alone: {e}")
+            try:
+                _append_in_order(lib, table_name, rows_df)
+            finally:
+                rebuffer()
+        with _state_lock:
+            _unpruned_tables.add(table_name)
+        # Rows written by other paths may carry asset_class CASH: re-read the latest CASH on the next fill
+        if rows_df is not None and 'asset_class' in rows_df.columns and (rows_df['asset_class'] == 'CASH').any():
+            _last_cash.pop(table_name, None)
+    return True
+
+
+def flush_cash_buffer(portfolio_manager, table_name: Optional[str] = None):
+    """
+    Write buffered CASH rows to ArcticDB.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        table_name: Flush only this strategy table. None = all tables
+    """
+    if table_name is not None:
+        tables = [table_name]
+    else:
+        with _state_lock:
+            tables = list(_cash_buffer)
+    for table in tables:
+        if not _pending_cash_rows(table):
+            continue
+        try:
+            append_strategy_rows(portfolio_manager, table)
+        except Exception as e:
+            print(f"[PORTFOLIO ERROR] Failed to flush buffered CASH rows for {table}: {e}")
+
+
+def prune_strategy_tables(portfolio_manager):
+    """
+    Drop previous versions of every strategy table appended to since the last prune.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+    """
+    global _last_prune
+    # Take the pending tables under the lock: a concurrent prune gets the remainder, never the same table
+    with _state_lock:
+        _last_prune = time.monotonic()
+        tables = list(_unpruned_tables)
+        _unpruned_tables.clear()
+    lib = portfolio_manager.account_library
+    for table in tables:
+        try:
+            with _table_lock(table):
+                lib.prune_previous_versions(table)
+        except Exception as e:
+            print(f"[PORTFOLIO ERROR] Failed to prune previous versions of {table}: {e}")
+            with _state_lock:
+                _unpruned_tables.add(table)
+
+
+def prune_due() -> bool:
+    """True once PRUNE_INTERVAL_SECS have passed since the last prune and tables are waiting for one."""
+    with _state_lock:
+        return bool(_unpruned_tables) and time.monotonic() - _last_prune >= PRUNE_INTERVAL_SECS
 
 
 async def hourly_strategy_snapshot_task(portfolio_manager):
@@ -15,19 +235,20 @@ async def hourly_strategy_snapshot_task(portfolio_manager):
     Args:
         portfolio_manager: Reference to PortfolioManager instance
     """
+    consecutive_errors = 0
     while True:
         try:
             # Calculate seconds until next run
             now = datetime.now(timezone.utc)
-            next_run = (now + pd.Timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-            # next_run = (now + pd.Timedelta(minutes=1)).replace(second=0, microsecond=0)
+            next_run = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+            # next_run = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
             seconds_until_next = (next_run - now).total_seconds()
             
             print(f"[PORTFOLIO] Next strategy snapshot in {seconds_until_next:.1f} seconds")
             await asyncio.sleep(seconds_until_next)
             
-            # Write strategy positions snapshot
-            await write_strategy_positions_snapshot(portfolio_manager)
+            # Write strategy positions snapshot; the account summary shares its timestamp
+            snapshot_time = await write_strategy_positions_snapshot(portfolio_manager) or datetime.now(timezone.utc)
 
             # 3. Write Account Summary Snapshot (Total Equity/Cash)
             try:
@@ -45,47 +266,52 @@ async def hourly_strategy_snapshot_task(portfolio_manager):
                     buying_power = next((float(e.value) for e in acct_summary if e.tag == 'BuyingPower'), 0.0)
                     currency = next((e.currency for e in acct_summary if e.tag == 'NetLiquidation'), 'USD')
                     
-                    summary_row = {
+                    summary_df = _single_row_frame({
                         'equity': net_liq,
                         'cash': total_cash,
                         'available_funds': available_funds,
                         'buying_power': buying_power,
                         'currency': currency,
-                        'timestamp': datetime.now(timezone.utc)
-                    }
+                    }, snapshot_time)
                     
-                    summary_df = pd.DataFrame([summary_row])
-                    summary_df.set_index('timestamp', inplace=True)
-                    
-                    # Write to 'account_summary' table
+                    # Write to 'account_summary' table (off the event loop, ArcticDB calls are blocking)
+                    lib = portfolio_manager.account_library
                     try:
-                        if 'account_summary' in portfolio_manager.account_library.list_symbols():
-                            portfolio_manager.account_library.append('account_summary', summary_df, prune_previous_versions=True)
+                        if 'account_summary' in await asyncio.to_thread(lib.list_symbols):
+                            await asyncio.to_thread(lib.append, 'account_summary', summary_df, prune_previous_versions=True)
                         else:
-                            portfolio_manager.account_library.write('account_summary', summary_df, prune_previous_versions=True)
+                            await asyncio.to_thread(lib.write, 'account_summary', summary_df, prune_previous_versions=True)
                     except Exception as schema_error:
                         # If append fails (likely due to schema mismatch from legacy table), overwrite it
                         print(f"[PORTFOLIO WARNING] Schema mismatch for account_summary, overwriting table: {schema_error}")
-                        portfolio_manager.account_library.write('account_summary', summary_df, prune_previous_versions=True)
+                        await asyncio.to_thread(lib.write, 'account_summary', summary_df, prune_previous_versions=True)
                     
                     print(f"[PORTFOLIO] Saved account summary snapshot: Equity={net_liq:,.2f} {currency}")
             except Exception as e:
                 print(f"[PORTFOLIO ERROR] Failed to save account summary snapshot: {e}")
             
+            consecutive_errors = 0
+            
         except asyncio.CancelledError:
             print("[PORTFOLIO] Hourly snapshot task cancelled")
             break
         except Exception as e:
-            print(f"[PORTFOLIO ERROR] Error in hourly snapshot task: {e}")
-            await asyncio.sleep(300)  # Wait 5 minutes on error
+            # Exponential backoff (5 min doubling, capped at 1h) with jitter to avoid synchronized retries
+            delay = min(300 * 2 ** consecutive_errors, 3600) + random.uniform(0, 30)
+            consecutive_errors += 1
+            print(f"[PORTFOLIO ERROR] Error in hourly snapshot task: {e} (retrying in {delay:.0f}s)")
+            await asyncio.sleep(delay)
 
 
-async def write_strategy_positions_snapshot(portfolio_manager):
+async def write_strategy_positions_snapshot(portfolio_manager) -> Optional[datetime]:
     """
     Write current strategy positions to ArcticDB for each strategy in the portfolio.
     
     Args:
         portfolio_manager: Reference to PortfolioManager instance
+        
+    Returns:
+        datetime: Timestamp stamped on the snapshot rows, None if nothing was snapshotted
     """
     try:
         if not portfolio_manager.account_library:
@@ -100,28 +326,10 @@ async def write_strategy_positions_snapshot(portfolio_manager):
             portfolio_df = pd.DataFrame()
         
         # 2. Identify all strategies to snapshot (Active + In Portfolio)
-        strategies_to_snapshot = set()
-        
-        # A) Get Active Strategies from metadata
-        try:
-            lib = portfolio_manager.ac.get_library('general', create_if_missing=True)
-            if lib.has_symbol('strategies'):
-                meta_df = lib.read('strategies').data
-                if not meta_df.empty:
-                    if meta_df.index.name == 'strategy_symbol':
-                        meta_df = meta_df.reset_index()
-                    
-                    if 'active' in meta_df.columns:
-                        # Boolean or 1/0 check
-                        active_mask = (meta_df['active'] == True) | (meta_df['active'] == 1)
-                        active_syms = meta_df[active_mask]['strategy_symbol'].astype(str).tolist()
-                        strategies_to_snapshot.update(s.upper() for s in active_syms)
-                    else:
-                        # If no active col, take all
-                        all_syms = meta_df['strategy_symbol'].astype(str).tolist()
-                        strategies_to_snapshot.update(s.upper() for s in all_syms)
-        except Exception as meta_e:
-            print(f"[PORTFOLIO WARNING] Failed to load active strategies from metadata: {meta_e}")
+        # A) Active strategies from metadata (cached on the portfolio manager, refreshed after CRUD)
+        if getattr(portfolio_manager, '_active_strategies_cache', None) is None:
+            portfolio_manager._active_strategies_cache = await asyncio.to_thread(load_active_strategies, portfolio_manager)
+        strategies_to_snapshot = set(portfolio_manager._active_strategies_cache or ())
 
         # B) Add strategies present in portfolio (even if inactive)
         if not portfolio_df.empty and 'strategy' in portfolio_df.columns:
@@ -132,19 +340,63 @@ async def write_strategy_positions_snapshot(portfolio_manager):
             print("[PORTFOLIO] No strategies found for snapshot")
             return
         
+        # Taken after reconciliation: fills recorded meanwhile are older and included in the CASH read
         snapshot_time = datetime.now(timezone.utc)
         snapshot_count = 0
+        skipped_count = 0
+        
+        # ArcticDB calls are blocking: run them in a worker thread so IB callbacks keep flowing
+        await asyncio.to_thread(flush_cash_buffer, portfolio_manager)
         
-        for strategy in strategies_to_snapshot:
+        # Split the fresh portfolio by strategy once (one pass instead of a mask per strategy).
+        # Strategies holding positions have market values that move every hour.
+        if not portfolio_df.empty and 'strategy' in portfolio_df.columns:
+            portfolio_groups = {k: v for k, v in portfolio_df.groupby('strategy', sort=False)}
+        else:
+            portfolio_groups = {}
+        strategies_with_any_position = set(portfolio_groups)
+        
+        # strategy -> (equity, realized_pnl, currency, written_at) of the last EQUITY row written for an
+        # idle strategy; entries are dropped whenever the strategy table receives a fill or CASH update
+        last_equity_cache = getattr(portfolio_manager, '_last_equity_cache', None)
+        if last_equity_cache is None:
+            last_equity_cache = portfolio_manager._last_equity_cache = {}
+        
+        for i, strategy in enumerate(strategies_to_snapshot):
+            # Cooperatively yield to the event loop every few strategies
+            if i and i % SNAPSHOT_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
             try:
-                # Filter positions for this strategy from the FRESH portfolio
+                # Idle strategy: no positions and nothing written to its table since the
+                # last snapshot, so equity cannot have changed -> skip the reads, and the write
+                # unless the last EQUITY row is IDLE_EQUITY_INTERVAL old (then carry it forward)
+                cached = None if strategy in strategies_with_any_position else last_equity_cache.get(strategy)
+                if cached is not None:
+                    equity_value, realized_pnl_total, currency_code, written_at = cached
+                    if snapshot_time - written_at < IDLE_EQUITY_INTERVAL:
+                        skipped_count += 1
+                        continue
+                    equity_snapshot = _single_row_frame({
+                        'strategy': strategy,
+                        'symbol': 'EQUITY',
+                        'asset_class': 'EQUITY',
+                        'exchange': '',
+                        'currency': currency_code,
+                        'quantity': float(equity_value),
+                        'avg_cost': 1.0,
+                        'realized_pnl': float(realized_pnl_total),
+                    }, snapshot_time)
+                    await asyncio.to_thread(append_strategy_rows, portfolio_manager, f"strategy_{strategy}", equity_snapshot)
+                    last_equity_cache[strategy] = (equity_value, realized_pnl_total, currency_code, snapshot_time)
+                    snapshot_count += 1
+                    continue
+                
+                # Positions for this strategy from the FRESH portfolio
                 # Use fallback empty DF if portfolio is empty
-                if not portfolio_df.empty and 'strategy' in portfolio_df.columns:
-                    strategy_positions = portfolio_df[portfolio_df['strategy'] == strategy].copy()
-                else:
-                    strategy_positions = pd.DataFrame()
+                strategy_positions = portfolio_groups.get(strategy, pd.DataFrame()).copy()
                 
                 # Even if strategy_positions is empty, we might have CASH, so we proceed.
+                snapshot_frames = []
                 
                 if not strategy_positions.empty:
                     # Convert portfolio structure to fill-based structure
@@ -162,25 +414,19 @@ async def write_strategy_positions_snapshot(portfolio_manager):
                     
                     # Set timestamp as index
                     fill_structure.set_index('timestamp', inplace=True)
-                    
-                    # Write/append to strategy table
-                    table_name = f"strategy_{strategy}"
-                    
-                    if table_name in portfolio_manager.account_library.list_symbols():
-                        try:
-                            portfolio_manager.account_library.append(table_name, fill_structure, prune_previous_versions=True)
-                        except:
-                            portfolio_manager.account_library.write(table_name, fill_structure, prune_previous_versions=True)
-                    else:
-                        portfolio_manager.account_library.write(table_name, fill_structure, prune_previous_versions=True)
+                    snapshot_frames.append(fill_structure)
                 
-                # Calculate and save equity snapshot
+                # Calculate equity snapshot
                 # CRITICAL: Pass the fresh portfolio_df to use live market prices
                 try:
-                    equity_value = await calculate_strategy_equity(portfolio_manager, strategy, portfolio_df)
-                    
                     # Get CASH and positions value for breakdown (for realized_pnl tracking)
+                    # Fetched once and shared with calculate_strategy_equity to avoid a second read
                     positions_df = await get_strategy_positions(portfolio_manager, strategy, current_only=True)
+                    equity_value = await calculate_strategy_equity(
+                        portfolio_manager, strategy, portfolio_df,
+                        positions_df=positions_df, strat_port=portfolio_groups.get(strategy, pd.DataFrame())
+                    )
+                    
                     realized_pnl_total = 0.0
                     currency_code = 'USD'
 
@@ -194,42 +440,96 @@ async def write_strategy_positions_snapshot(portfolio_manager):
                             currency_code = positions_df.iloc[0]['currency']
 
                     # Create EQUITY snapshot row
-                    equity_snapshot = pd.DataFrame([{
+                    equity_snapshot = _single_row_frame({
                         'strategy': strategy,
                         'symbol': 'EQUITY',
                         'asset_class': 'EQUITY',
                         'exchange': '',
                         'currency': currency_code,
-                        'quantity': equity_value,  # Total equity (Mark-to-Market)
+                        'quantity': float(equity_value),  # Total equity (Mark-to-Market)
                         'avg_cost': 1.0,
-                        'realized_pnl': realized_pnl_total,
-                        'timestamp': snapshot_time
-                    }])
-                    equity_snapshot.set_index('timestamp', inplace=True)
-                    
-                    # Append EQUITY snapshot to same table
-                    table_name = f"strategy_{strategy}"
+                        'realized_pnl': float(realized_pnl_total),
+                    }, snapshot_time)
+                    snapshot_frames.append(equity_snapshot)
                     
-                    # Ensure table exists (if it was empty positions and just created/accessed)
-                    if table_name not in portfolio_manager.account_library.list_symbols():
-                         portfolio_manager.account_library.write(table_name, equity_snapshot, prune_previous_versions=True)
+                    # Remember equity of idle strategies so later snapshots can skip them
+                    if strategy in strategies_with_any_position:
+                        last_equity_cache.pop(strategy, None)
                     else:
-                        portfolio_manager.account_library.append(table_name, equity_snapshot, prune_previous_versions=True)
+                        last_equity_cache[strategy] = (equity_value, realized_pnl_total, currency_code, snapshot_time)
                     
                 except Exception as equity_error:
                     print(f"[PORTFOLIO WARNING] Could not save equity snapshot for {strategy}: {equity_error}")
+                
+                # Positions + EQUITY share the snapshot timestamp: write them in a single append.
+                # Same path (and table lock) as the fill writers, which may run concurrently
+                if snapshot_frames:
+                    combined = pd.concat(snapshot_frames) if len(snapshot_frames) > 1 else snapshot_frames[0]
+                    await asyncio.to_thread(append_strategy_rows, portfolio_manager, f"strategy_{strategy}", combined)
                     
                 snapshot_count += 1
                 
             except Exception as e:
                 print(f"[PORTFOLIO ERROR] Error writing snapshot for strategy {strategy}: {e}")
         
-        print(f"[PORTFOLIO] Completed hourly snapshot for {snapshot_count} strategies with equity tracking")
+        # One prune pass for all tables written this cycle
+        await asyncio.to_thread(prune_strategy_tables, portfolio_manager)
+        
+        print(f"[PORTFOLIO] Completed hourly snapshot for {snapshot_count} strategies with equity tracking ({skipped_count} idle skipped)")
+        return snapshot_time
         
     except Exception as e:
         print(f"[PORTFOLIO ERROR] Error in strategy positions snapshot: {e}")
 
 
+def load_active_strategies(portfolio_manager) -> set:
+    """
+    Read the active strategy symbols from the 'general/strategies' metadata table.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        
+    Returns:
+        set: Upper-cased strategy symbols (all strategies if no 'active' column exists),
+            or None if the metadata could not be read
+    """
+    active_strategies = set()
+    try:
+        lib = portfolio_manager.ac.get_library('general', create_if_missing=True)
+        if lib.has_symbol('strategies'):
+            meta_df = lib.read('strategies').data
+            if not meta_df.empty:
+                if meta_df.index.name == 'strategy_symbol':
+                    meta_df = meta_df.reset_index()
+                
+                if 'active' in meta_df.columns:
+                    # Boolean or 1/0 check
+                    active_mask = (meta_df['active'] == True) | (meta_df['active'] == 1)
+                    active_syms = meta_df[active_mask]['strategy_symbol'].astype(str).tolist()
+                    active_strategies.update(s.upper() for s in active_syms)
+                else:
+                    # If no active col, take all
+                    all_syms = meta_df['strategy_symbol'].astype(str).tolist()
+                    active_strategies.update(s.upper() for s in all_syms)
+    except Exception as meta_e:
+        print(f"[PORTFOLIO WARNING] Failed to load active strategies from metadata: {meta_e}")
+        return None
+    return active_strategies
+
+
+def invalidate_last_equity(portfolio_manager, strategy_symbol: str):
+    """
+    Forget the last snapshotted equity of a strategy so the next hourly snapshot recomputes it.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        strategy_symbol: Strategy identifier
+    """
+    last_equity_cache = getattr(portfolio_manager, '_last_equity_cache', None)
+    if last_equity_cache:
+        last_equity_cache.pop(str(strategy_symbol).upper(), None)
+
+
 def start_hourly_snapshot_task(portfolio_manager) -> Optional[asyncio.Task]:
     """
     Start the background task for hourly strategy position snapshots.
@@ -261,7 +561,73 @@ def stop_hourly_snapshot_task(task: Optional[asyncio.Task]):
         print("[PORTFOLIO] Stopped hourly strategy snapshot task")
 
 
-async def initialize_strategy_cash(portfolio_manager, strategy_symbol: str, initial_cash: float, currency: str = 'USD'):
+async def cash_flush_task(portfolio_manager):
+    """
+    Background task writing buffered CASH rows once they are CASH_FLUSH_SECS old, and pruning
+    previous versions of touched strategy tables every PRUNE_INTERVAL_SECS.
+    
+    Without it a buffer is only checked on the next fill, leaving the CASH row of a lone fill
+    in memory until a later read or the hourly snapshot.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+    """
+    while True:
+        try:
+            await asyncio.sleep(CASH_FLUSH_SECS)
+            now = time.monotonic()
+            with _state_lock:
+                tables = list(_cash_buffer_since)
+            for table in tables:
+                if _cash_flush_due(table, now):
+                    await asyncio.to_thread(flush_cash_buffer, portfolio_manager, table)
+            if prune_due():
+                await asyncio.to_thread(prune_strategy_tables, portfolio_manager)
+        except asyncio.CancelledError:
+            print("[PORTFOLIO] CASH flush task cancelled")
+            break
+        except Exception as e:
+            print(f"[PORTFOLIO ERROR] Error in CASH flush task: {e}")
+
+
+def start_cash_flush_task(portfolio_manager) -> Optional[asyncio.Task]:
+    """
+    Start the background task flushing buffered CASH rows.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        
+    Returns:
+        asyncio.Task: The created background task
+    """
+    try:
+        task = asyncio.create_task(cash_flush_task(portfolio_manager))
+        print("[PORTFOLIO] Started CASH flush task")
+        return task
+    except Exception as e:
+        print(f"[PORTFOLIO ERROR] Failed to start CASH flush task: {e}")
+        return None
+
+
+def stop_cash_flush_task(task: Optional[asyncio.Task]):
+    """
+    Stop the background task flushing buffered CASH rows.
+    
+    Args:
+        task: The asyncio.Task to cancel
+    """
+    if task and not task.done():
+        task.cancel()
+        print("[PORTFOLIO] Stopped CASH flush task")
+
+
+async def initialize_strategy_cash(
+    portfolio_manager,
+    strategy_symbol: str,
+    initial_cash: float,
+    currency: str = 'USD',
+    timestamp: Optional[datetime] = None
+):
     """
     Initialize CASH position for a new strategy.
     
@@ -273,6 +639,7 @@ async def initialize_strategy_cash(portfolio_manager, strategy_symbol: str, init
         strategy_symbol: Strategy identifier (e.g., 'momentum', 'aapl_ema')
         initial_cash: Initial cash amount allocated to this strategy
         currency: Currency code (default: 'USD')
+        timestamp: Timestamp of the CASH row (default: now, UTC)
         
     Returns:
         bool: True if successful, False otherwise
@@ -282,37 +649,39 @@ async def initialize_strategy_cash(portfolio_manager, strategy_symbol: str, init
             print(f"[PORTFOLIO ERROR] No account library available for strategy {strategy_symbol}")
             return False
             
-        # Create CASH position entry
-        cash_position = {
+        # Create CASH position entry (DataFrame with timestamp index)
+        cash_df = _single_row_frame({
             'strategy': strategy_symbol,
             'symbol': currency,
             'asset_class': 'CASH',
             'exchange': '',
             'currency': currency,
-            'quantity': initial_cash,
+            'quantity': float(initial_cash),
             'avg_cost': 1.0,  # Always 1.0 for CASH
             'realized_pnl': 0.0,
-            'timestamp': datetime.now(timezone.utc)
-        }
-        
-        # Create DataFrame with timestamp index
-        cash_df = pd.DataFrame([cash_position])
-        cash_df['timestamp'] = pd.to_datetime(cash_df['timestamp'])
-        cash_df.set_index('timestamp', inplace=True)
+        }, timestamp or datetime.now(timezone.utc))
         
         # Write to strategy table
         table_name = f"strategy_{strategy_symbol}"
         
-        # Check if table already exists
-        if table_name in portfolio_manager.account_library.list_symbols():
-            # Append to existing table
-            portfolio_manager.account_library.append(table_name, cash_df, prune_previous_versions=True)
-            print(f"[PORTFOLIO] Appended CASH position to existing strategy {strategy_symbol}: {currency} {initial_cash:,.2f}")
-        else:
-            # Create new table
-            portfolio_manager.account_library.write(table_name, cash_df, prune_previous_versions=True)
-            print(f"[PORTFOLIO] Initialized strategy {strategy_symbol} with CASH: {currency} {initial_cash:,.2f}")
+        invalidate_last_equity(portfolio_manager, strategy_symbol)
         
+        def write():
+            with _table_lock(table_name):
+                _last_cash.pop(table_name, None)
+                # Check if table already exists
+                if portfolio_manager.account_library.has_symbol(table_name):
+                    # Append to existing table (after any buffered CASH rows)
+                    append_strategy_rows(portfolio_manager, table_name, cash_df)
+                    print(f"[PORTFOLIO] Appended CASH position to existing strategy {strategy_symbol}: {currency} {initial_cash:,.2f}")
+                else:
+                    # Create new table
+                    _take_pending_cash(table_name)
+                    portfolio_manager.account_library.write(table_name, cash_df, prune_previous_versions=True)
+                    print(f"[PORTFOLIO] Initialized strategy {strategy_symbol} with CASH: {currency} {initial_cash:,.2f}")
+        
+        # Lock wait and ArcticDB calls off the event loop
+        await asyncio.to_thread(write)
         return True
         
     except Exception as e:
@@ -326,7 +695,8 @@ async def get_strategy_positions(
     symbol: Optional[str] = None,
     current_only: bool = True,
     days_lookback: Optional[int] = 7,
-    exclude_equity: bool = True
+    exclude_equity: bool = True,
+    timestamp: Optional[datetime] = None
 ):
     """
     Get strategy positions with flexible query options.
@@ -338,6 +708,7 @@ async def get_strategy_positions(
         current_only: If True, returns latest entry per symbol. If False, returns full history
         days_lookback: Number of days to look back for efficiency. None = all data
         exclude_equity: If True, excludes EQUITY snapshots (default). Set to False to include equity history
+        timestamp: End of the lookback window (default: now, UTC)
         
     Returns:
         - If symbol is specified: Dict with position data or None if not found
@@ -361,9 +732,15 @@ async def get_strategy_positions(
             return None if symbol else pd.DataFrame()
         
         table_name = f"strategy_{strategy_symbol}"
+        lib = portfolio_manager.account_library
+        
+        # Buffered CASH rows must be visible to readers that can see CASH
+        pending = _pending_cash_rows(table_name)
+        if pending and (symbol is None or any(row['symbol'] == symbol for row in pending)):
+            await asyncio.to_thread(flush_cash_buffer, portfolio_manager, table_name)
         
         # Check if table exists
-        if table_name not in portfolio_manager.account_library.list_symbols():
+        if table_name not in await asyncio.to_thread(lib.list_symbols):
             return None if symbol else pd.DataFrame()
         
         # Build query
@@ -374,7 +751,7 @@ async def get_strategy_positions(
         
         # Apply date range filter if specified
         if days_lookback is not None:
-            end_time = datetime.now(timezone.utc)
+            end_time = timestamp or datetime.now(timezone.utc)
             start_time = end_time - timedelta(days=days_lookback)
             q = q.date_range((start_time, end_time))
         
@@ -382,18 +759,25 @@ async def get_strategy_positions(
         if symbol is not None:
             q = q[q['symbol'] == symbol]
         
-        # Execute query
+        # Exclude EQUITY snapshots if requested (default behavior), filtered in storage
+        drop_equity = exclude_equity and symbol != 'EQUITY'
+        if drop_equity:
+            q = q[q['asset_class'] != 'EQUITY']
+        
+        # Execute query (in a worker thread, ArcticDB reads block)
         try:
-            if days_lookback is not None or symbol is not None:
-                df = portfolio_manager.account_library.read(table_name, query_builder=q).data
+            if days_lookback is not None or symbol is not None or drop_equity:
+                df = (await asyncio.to_thread(lib.read, table_name, query_builder=q)).data
             else:
-                df = portfolio_manager.account_library.read(table_name).data
+                df = (await asyncio.to_thread(lib.read, table_name)).data
         except Exception as e:
             # Fallback: read without query if it fails
             try:
-                df = portfolio_manager.account_library.read(table_name).data
+                df = (await asyncio.to_thread(lib.read, table_name)).data
                 if symbol:
                     df = df[df['symbol'] == symbol]
+                if drop_equity:
+                    df = df[df['asset_class'] != 'EQUITY']
             except Exception:
                 print(f"[PORTFOLIO ERROR] Failed to read strategy table {table_name}: {e}")
                 return None if symbol else pd.DataFrame()
@@ -401,13 +785,6 @@ async def get_strategy_positions(
         if df.empty:
             return None if symbol else pd.DataFrame()
         
-        # Exclude EQUITY snapshots if requested (default behavior)
-        if exclude_equity and symbol != 'EQUITY':
-            df = df[df['asset_class'] != 'EQUITY']
-        
-        if df.empty:
-            return None if symbol else pd.DataFrame()
-        
         # If current_only, get latest entry per symbol
         if current_only:
             df = df.reset_index()
@@ -489,7 +866,13 @@ async def get_strategy_equity_history(
         return pd.DataFrame()
 
 
-async def calculate_strategy_equity(portfolio_manager, strategy_symbol: str, portfolio_df: pd.DataFrame = None) -> float:
+async def calculate_strategy_equity(
+    portfolio_manager,
+    strategy_symbol: str,
+    portfolio_df: pd.DataFrame = None,
+    positions_df: pd.DataFrame = None,
+    strat_port: pd.DataFrame = None
+) -> float:
     """
     Calculate total equity for a strategy in its base currency.
     Equity = CASH + Sum(position_values_in_strategy_currency)
@@ -501,6 +884,9 @@ async def calculate_strategy_equity(portfolio_manager, strategy_symbol: str, por
         portfolio_manager: Reference to PortfolioManager instance
         strategy_symbol: Strategy identifier
         portfolio_df: Optional DataFrame containing current portfolio with market values
+        positions_df: Optional current positions (as returned by get_strategy_positions with
+            current_only=True). If provided, the strategy table is not read again.
+        strat_port: Optional rows of portfolio_df already filtered for this strategy
         
     Returns:
         float: Total equity in strategy's base currency
@@ -508,7 +894,8 @@ async def calculate_strategy_equity(portfolio_manager, strategy_symbol: str, por
     try:
         # Get current positions (exclude EQUITY snapshots to avoid recursion!)
         # We fetch this to get the CASH position and list of symbols.
-        positions_df = await get_strategy_positions(portfolio_manager, strategy_symbol, current_only=True, exclude_equity=True)
+        if positions_df is None:
+            positions_df = await get_strategy_positions(portfolio_manager, strategy_symbol, current_only=True, exclude_equity=True)
         
         if positions_df is None or positions_df.empty:
             return 0.0
@@ -529,58 +916,53 @@ async def calculate_strategy_equity(portfolio_manager, strategy_symbol: str, por
         # If portfolio_df is available, we prioritize Market Value from there.
         
         if portfolio_df is not None and not portfolio_df.empty and 'strategy' in portfolio_df.columns:
-            # Filter portfolio for this strategy
-            strat_port = portfolio_df[portfolio_df['strategy'] == strategy_symbol]
+            # Filter portfolio for this strategy (unless the caller already did)
+            if strat_port is None:
+                strat_port = portfolio_df[portfolio_df['strategy'] == strategy_symbol]
             
             # Sum market value (converted to strategy currency)
             base_currency = getattr(portfolio_manager, 'base_currency', 'USD')
             
-            for _, row in strat_port.iterrows():
-                # marketValue in portfolio is usually in Account Base Currency
-                # Note: PortfolioManager.reconcile_positions ensures 'marketValue' is in Base Currency for display
-                
-                mv_base = float(row.get('marketValue', 0.0))
-                
-                # Convert Account Base -> Strategy Currency
-                if base_currency != strategy_currency:
-                    if portfolio_manager.fx_cache:
-                        # We need Base -> Strategy rate
-                        rate = await portfolio_manager.fx_cache.get_fx_rate(base_currency, strategy_currency)
-                        total_position_value += mv_base * rate
-                    else:
-                         # Fallback: assume 1:1 if no FX
-                         total_position_value += mv_base
-                else:
-                    total_position_value += mv_base
+            # marketValue in portfolio is usually in Account Base Currency
+            # Note: PortfolioManager.reconcile_positions ensures 'marketValue' is in Base Currency for display
+            if 'marketValue' in strat_port.columns:
+                mv_base = float(strat_port['marketValue'].to_numpy(dtype=float).sum())
+            else:
+                mv_base = 0.0
+            
+            # Convert Account Base -> Strategy Currency (single rate for the whole strategy)
+            # Fallback: assume 1:1 if no FX
+            if mv_base and base_currency != strategy_currency and portfolio_manager.fx_cache:
+                rate = await portfolio_manager.fx_cache.get_fx_rate(base_currency, strategy_currency)
+                total_position_value = mv_base * rate
+            else:
+                total_position_value = mv_base
                     
         else:
             # Fallback: Use stored avg_cost from positions_df (Cost Basis)
             non_cash = positions_df[(positions_df['asset_class'] != 'CASH') & (positions_df['asset_class'] != 'EQUITY')]
             
-            for _, pos in non_cash.iterrows():
-                quantity = float(pos['quantity'])
-                
-                # Skip closed positions (quantity = 0)
-                if quantity == 0:
-                    continue
-                
-                # Use avg_cost as the position value
-                avg_cost = float(pos['avg_cost'])
-                position_currency = pos['currency']
-                
-                # Position value in its currency
-                position_value = quantity * avg_cost
+            # Skip closed positions (quantity = 0)
+            quantities = non_cash['quantity'].to_numpy(dtype=float)
+            open_mask = quantities != 0
+            
+            if open_mask.any():
+                # Position value in its currency (avg_cost as the position value)
+                position_values = quantities[open_mask] * non_cash['avg_cost'].to_numpy(dtype=float)[open_mask]
+                currencies = non_cash['currency'].to_numpy()[open_mask]
                 
-                # Convert to strategy currency if different
-                if position_currency != strategy_currency:
-                    if portfolio_manager.fx_cache:
-                        fx_rate = await portfolio_manager.fx_cache.get_fx_rate(position_currency, strategy_currency)
-                        position_value = position_value * fx_rate
+                # One FX lookup per currency -> rate table indexed by categorical code
+                unique_ccys = list(pd.unique(currencies))
+                rates = []
+                for ccy in unique_ccys:
+                    if ccy != strategy_currency and portfolio_manager.fx_cache:
+                        rates.append(await portfolio_manager.fx_cache.get_fx_rate(ccy, strategy_currency))
                     else:
-                        # print(f"[PORTFOLIO WARNING] FX cache not available for {pos['symbol']}")
-                        pass
+                        rates.append(1.0)
+                rate_by_ccy = np.array(rates, dtype=float)
+                ccy_codes = pd.Categorical(currencies, categories=unique_ccys).codes
                 
-                total_position_value += position_value
+                total_position_value = float((position_values * rate_by_ccy[ccy_codes]).sum())
         
         total_equity = cash_value + total_position_value
         
@@ -593,7 +975,137 @@ async def calculate_strategy_equity(portfolio_manager, strategy_symbol: str, por
         return 0.0
 
 
-async def update_strategy_cash(portfolio_manager, strategy_symbol: str, fill_data: dict):
+def _read_latest_cash(portfolio_manager, strategy_symbol: str, table_name: str, end_time: datetime) -> Optional[dict]:
+    """
+    Read the most recent CASH row of a strategy table from ArcticDB.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        strategy_symbol: Strategy identifier
+        table_name: Strategy table name (strategy_{strategy_symbol})
+        end_time: End of the 7-day lookback window
+        
+    Returns:
+        dict: Latest CASH row, or None if the table or the CASH position does not exist
+    """
+    # Check if strategy table exists
+    if not portfolio_manager.account_library.has_symbol(table_name):
+        print(f"[PORTFOLIO ERROR] Strategy table {table_name} does not exist. Cannot update CASH.")
+        return None
+    
+    # Use QueryBuilder to efficiently read only the latest CASH position
+    # Read only last 7 days to avoid loading thousands of historical CASH rows
+    from arcticdb import QueryBuilder
+    
+    start_time = end_time - timedelta(days=7)
+    
+    q = QueryBuilder()
+    q = q[q['asset_class'] == 'CASH']
+    q = q.date_range((start_time, end_time))
+    
+    try:
+        cash_df = portfolio_manager.account_library.read(table_name, query_builder=q).data
+    except Exception as e:
+        print(f"[PORTFOLIO ERROR] Failed to query CASH position: {e}")
+        return None
+    
+    # Get latest CASH position
+    if cash_df.empty:
+        # Fallback: tail read (only the last data segment) for strategies with no recent fills
+        try:
+            tail_df = portfolio_manager.account_library.tail(table_name, n=200).data
+            cash_df = tail_df[tail_df['asset_class'] == 'CASH']
+        except Exception:
+            pass
+        
+        if cash_df.empty:
+            # Last resort: CASH row older than the tail window, scan full history
+            try:
+                q_fallback = QueryBuilder()
+                q_fallback = q_fallback[q_fallback['asset_class'] == 'CASH']
+                cash_df = portfolio_manager.account_library.read(table_name, query_builder=q_fallback).data
+            except Exception:
+                pass
+        
+        if cash_df.empty:
+            print(f"[PORTFOLIO WARNING] No CASH position found for {strategy_symbol}. Cannot update CASH without initial position.")
+            return None
+    
+    # Get the most recent entry (index is already sorted by ArcticDB)
+    return cash_df.iloc[-1].to_dict()
+
+
+def adjust_strategy_cash(
+    portfolio_manager,
+    strategy_symbol: str,
+    amount: float,
+    currency: str,
+    extra_rows: Optional[List[dict]] = None,
+    timestamp: Optional[datetime] = None
+):
+    """
+    Move the CASH balance of a strategy by amount, optionally appending position rows with it.
+    
+    Used for manual changes (portfolio reassignment). The latest CASH is read under the table lock,
+    including buffered fill rows, and the cached balance used by update_strategy_cash is replaced.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        strategy_symbol: Strategy identifier
+        amount: Amount added to the CASH balance (negative to debit)
+        currency: Currency of the new CASH row
+        extra_rows: Optional position rows (without timestamp) written in the same append
+        timestamp: Timestamp of the new rows (default: now, UTC)
+    """
+    table_name = f"strategy_{strategy_symbol}"
+    ts = timestamp or datetime.now(timezone.utc)
+    lib = portfolio_manager.account_library
+    
+    with _table_lock(table_name):
+        latest_cash = _last_cash.get(table_name)
+        if latest_cash is None and lib.has_symbol(table_name):
+            append_strategy_rows(portfolio_manager, table_name)
+            latest_cash = _read_latest_cash(portfolio_manager, strategy_symbol, table_name, ts)
+        cash = float(latest_cash['quantity']) if latest_cash is not None else 0.0
+        
+        cash_row = {
+            'strategy': strategy_symbol,
+            'symbol': currency,
+            'asset_class': 'CASH',
+            'exchange': '',
+            'currency': currency,
+            'quantity': cash + float(amount),
+            'avg_cost': 1.0,
+            'realized_pnl': float(latest_cash['realized_pnl']) if latest_cash is not None else 0.0,
+        }
+        frames = [_single_row_frame(r, ts) for r in [cash_row] + list(extra_rows or [])]
+        append_strategy_rows(portfolio_manager, table_name, pd.concat(frames) if len(frames) > 1 else frames[0])
+        _last_cash[table_name] = {**cash_row, 'timestamp': ts}
+    
+    invalidate_last_equity(portfolio_manager, strategy_symbol)
+
+
+def delete_strategy_table(portfolio_manager, strategy_symbol: str):
+    """
+    Delete a strategy table together with its buffered CASH rows and cached balance.
+    
+    Args:
+        portfolio_manager: Reference to PortfolioManager instance
+        strategy_symbol: Strategy identifier
+    """
+    table_name = f"strategy_{strategy_symbol}"
+    with _table_lock(table_name):
+        _take_pending_cash(table_name)
+        _last_cash.pop(table_name, None)
+        with _state_lock:
+            _unpruned_tables.discard(table_name)
+        lib = portfolio_manager.account_library
+        if lib.has_symbol(table_name):
+            lib.delete(table_name)
+    invalidate_last_equity(portfolio_manager, strategy_symbol)
+
+
+async def update_strategy_cash(portfolio_manager, strategy_symbol: str, fill_data: dict, timestamp: Optional[datetime] = None):
     """
     Update CASH position after a fill/trade.
     
@@ -604,6 +1116,7 @@ async def update_strategy_cash(portfolio_manager, strategy_symbol: str, fill_dat
         portfolio_manager: Reference to PortfolioManager instance
         strategy_symbol: Strategy identifier
         fill_data: Fill data dict with keys: symbol, side, quantity, price, commission, currency
+        timestamp: Timestamp of the new CASH row (default: now, UTC)
         
     Returns:
         bool: True if successful, False otherwise
@@ -614,47 +1127,26 @@ async def update_strategy_cash(portfolio_manager, strategy_symbol: str, fill_dat
             return False
         
         table_name = f"strategy_{strategy_symbol}"
-        
-        # Check if strategy table exists
-        if table_name not in portfolio_manager.account_library.list_symbols():
-            print(f"[PORTFOLIO ERROR] Strategy table {table_name} does not exist. Cannot update CASH.")
+        end_time = timestamp or datetime.now(timezone.utc)
+        
+        def latest():
+            # Latest CASH row known from a previous fill: no need to query ArcticDB
+            with _table_lock(table_name):
+                row = _last_cash.get(table_name)
+                if row is None:
+                    if _pending_cash_rows(table_name):
+                        append_strategy_rows(portfolio_manager, table_name)
+                    row = _read_latest_cash(portfolio_manager, strategy_symbol, table_name, end_time)
+                    if row is not None:
+                        _last_cash[table_name] = row
+                return row
+        
+        # Only the CASH currency is needed before the FX lookup; the balance itself is re-read
+        # under the table lock after the await, other writers may have moved it in between.
+        # Table lock waits and ArcticDB calls run in a worker thread, off the message queue loop
+        latest_cash = await asyncio.to_thread(latest)
+        if latest_cash is None:
             return False
-        
-        # Use QueryBuilder to efficiently read only the latest CASH position
-        # Read only last 7 days to avoid loading thousands of historical CASH rows
-        from arcticdb import QueryBuilder
-        from datetime import datetime, timedelta, timezone
-        
-        end_time = datetime.now(timezone.utc)
-        start_time = end_time - timedelta(days=7)
-        
-        q = QueryBuilder()
-        q = q[q['asset_class'] == 'CASH']
-        q = q.date_range((start_time, end_time))
-        
-        try:
-            cash_df = portfolio_manager.account_library.read(table_name, query_builder=q).data
-        except Exception as e:
-            print(f"[PORTFOLIO ERROR] Failed to query CASH position: {e}")
-            return False
-        
-        # Get latest CASH position
-        if cash_df.empty:
-            # Fallback: try without date_range (for strategies with no recent fills)
-            try:
-                q_fallback = QueryBuilder()
-                q_fallback = q_fallback[q_fallback['asset_class'] == 'CASH']
-                cash_df = portfolio_manager.account_library.read(table_name, query_builder=q_fallback).data
-            except Exception:
-                pass
-            
-            if cash_df.empty:
-                print(f"[PORTFOLIO WARNING] No CASH position found for {strategy_symbol}. Cannot update CASH without initial position.")
-                return False
-        
-        # Get the most recent entry (index is already sorted by ArcticDB)
-        latest_cash = cash_df.iloc[-1]
-        current_cash = float(latest_cash['quantity'])
         cash_currency = latest_cash['currency']
         
         # Calculate trade cost
@@ -672,45 +1164,63 @@ async def update_strategy_cash(portfolio_manager, strategy_symbol: str, fill_dat
             if portfolio_manager.fx_cache:
                 fx_rate = await portfolio_manager.fx_cache.get_fx_rate(fill_currency, cash_currency)
                 trade_cost = trade_cost / fx_rate
-                print(f"[PORTFOLIO] Converted trade cost from {fill_currency} to {cash_currency}: {trade_cost:,.2f} (rate={fx_rate:.4f})")
+                logger.debug("[PORTFOLIO] Converted trade cost from %s to %s: %.2f (rate=%.4f)",
+                             fill_currency, cash_currency, trade_cost, fx_rate)
             else:
                 print(f"[PORTFOLIO WARNING] FX cache not available, using trade cost without conversion")
         
-        # Update CASH based on side
-        if side in ['BOT', 'BUY']:
-            new_cash = current_cash - trade_cost
-            print(f"[PORTFOLIO] {strategy_symbol} BUY: CASH {cash_currency} {current_cash:,.2f} - {trade_cost:,.2f} = {new_cash:,.2f}")
-        elif side in ['SLD', 'SELL']:
-            new_cash = current_cash + trade_cost
-            print(f"[PORTFOLIO] {strategy_symbol} SELL: CASH {cash_currency} {current_cash:,.2f} + {trade_cost:,.2f} = {new_cash:,.2f}")
-        else:
+        if side not in ['BOT', 'BUY', 'SLD', 'SELL']:
             print(f"[PORTFOLIO ERROR] Unknown side: {side}")
             return False
         
-        # Create new CASH position entry
-        cash_position = {
-            'strategy': strategy_symbol,
-            'symbol': cash_currency,
-            'asset_class': 'CASH',
-            'exchange': '',
-            'currency': cash_currency,
-            'quantity': new_cash,
-            'avg_cost': 1.0,
-            'realized_pnl': float(latest_cash['realized_pnl']),
-            'timestamp': datetime.now(timezone.utc)
-        }
-        
-        # Append to strategy table
-        cash_df = pd.DataFrame([cash_position])
-        cash_df['timestamp'] = pd.to_datetime(cash_df['timestamp'])
-        cash_df.set_index('timestamp', inplace=True)
-        
-        portfolio_manager.account_library.append(table_name, cash_df, prune_previous_versions=True)
-        
-        return True
+        def apply() -> bool:
+            with _table_lock(table_name):
+                latest_cash = latest()
+                if latest_cash is None:
+                    return False
+                if latest_cash['currency'] != cash_currency:
+                    print(f"[PORTFOLIO ERROR] CASH currency of {strategy_symbol} changed during the update, fill not applied")
+                    return False
+                _apply_cash_delta(portfolio_manager, strategy_symbol, table_name, latest_cash,
+                                  trade_cost if side in ['BOT', 'BUY'] else -trade_cost, end_time)
+            if _cash_flush_due(table_name, time.monotonic()):
+                flush_cash_buffer(portfolio_manager, table_name)
+            return True
+        
+        return await asyncio.to_thread(apply)
         
     except Exception as e:
         print(f"[PORTFOLIO ERROR] Failed to update CASH for strategy {strategy_symbol}: {e}")
         import traceback
         traceback.print_exc()
-        return False
\ No newline at end of file
+        return False
+
+
+def _apply_cash_delta(portfolio_manager, strategy_symbol: str, table_name: str, latest_cash: dict,
+                      cost: float, end_time: datetime):
+    """Buffer a CASH row of latest_cash minus cost (caller holds the table lock)."""
+    current_cash = float(latest_cash['quantity'])
+    cash_currency = latest_cash['currency']
+    new_cash = current_cash - cost
+    logger.debug("[PORTFOLIO] %s CASH %s %.2f - %.2f = %.2f",
+                 strategy_symbol, cash_currency, current_cash, cost, new_cash)
+    
+    # Create new CASH position entry
+    cash_position = {
+        'strategy': strategy_symbol,
+        'symbol': cash_currency,
+        'asset_class': 'CASH',
+        'exchange': '',
+        'currency': cash_currency,
+        'quantity': float(new_cash),
+        'avg_cost': 1.0,
+        'realized_pnl': float(latest_cash['realized_pnl']),
+        'timestamp': end_time
+    }
+    _last_cash[table_name] = cash_position
+    invalidate_last_equity(portfolio_manager, strategy_symbol)
+    
+    # Buffer the row; it is written with the next append to this table or once the buffer is due
+    with _state_lock:
+        _cash_buffer.setdefault(table_name, []).append(cash_position)
+        _cash_buffer_since.setdefault(table_name, time.monotonic())
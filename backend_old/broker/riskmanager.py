@@ -5,15 +5,31 @@ import numpy as np
 from datetime import datetime, timedelta
 import yfinance as yf
 import asyncio
+from copy import copy
+from functools import lru_cache
+from operator import attrgetter
 
 from data_and_research import ac
 
+@lru_cache(maxsize=4096)
+def _stock_template(symbol, currency='USD'):
+    ''' Unqualified SMART-routed Stock contract per (symbol, currency), never handed out directly.'''
+    return Stock(symbol, 'SMART', currency)
+
+def _stock(symbol, currency='USD'):
+    ''' Fresh copy of the cached template: qualifyContracts fills conId/exchange in place, callers must not share it.'''
+    return copy(_stock_template(symbol, currency))
+
 class RiskManager:
+    HIST_OVERLAP_DAYS = 7  # cached days re-requested on an incremental update to detect split/dividend re-adjustments
+
     def __init__(self, ib_client: IB, portfolio_manager = None, arctic = None):
         self.ib = ib_client
         self.arctic = arctic if arctic else ac
         lib = self.arctic.get_library('univ')
         self.uni = lib.read('us_equities').data
+        # Symbol -> Sector lookup built once (hash lookups instead of scanning the universe per symbol)
+        self._sector_map = dict(zip(self.uni['Symbol'].to_numpy(), self.uni['Sector'].to_numpy()))
         if portfolio_manager:
             self.portfolio_manager = portfolio_manager
             self.fx_cache = self.portfolio_manager.fx_cache
@@ -23,17 +39,49 @@ class RiskManager:
     def pre_trade_check(self, contract, order):
         return self.ib.whatIfOrder(contract,order)
     
+    def _portfolio_frame(self):
+        ''' Build a DataFrame from ib.portfolio() column by column (no per-item introspection).'''
+        items = self.ib.portfolio()
+        n = len(items)
+        return pd.DataFrame({
+            'contract': [p.contract for p in items],
+            'position': np.fromiter((p.position for p in items), dtype=np.float64, count=n),
+            'marketPrice': np.fromiter((p.marketPrice for p in items), dtype=np.float64, count=n),
+            'marketValue': np.fromiter((p.marketValue for p in items), dtype=np.float64, count=n),
+            'averageCost': np.fromiter((p.averageCost for p in items), dtype=np.float64, count=n),
+            'unrealizedPNL': np.fromiter((p.unrealizedPNL for p in items), dtype=np.float64, count=n),
+            'realizedPNL': np.fromiter((p.realizedPNL for p in items), dtype=np.float64, count=n),
+            'account': [p.account for p in items],
+        }, copy=False)
+
     def get_portfolio_data(self):
-        portfolio = pd.DataFrame(self.ib.portfolio())
-        portfolio['symbol'] = portfolio['contract'].apply(lambda x: x.symbol)
-        portfolio['asset_class'] = portfolio['contract'].apply(lambda x: type(x))
+        portfolio = self._portfolio_frame()
+        portfolio['symbol'] = [c.symbol for c in portfolio['contract'].to_numpy()]
+        portfolio['asset_class'] = [type(c) for c in portfolio['contract'].to_numpy()]
         return portfolio
 
-    async def fetch_price_async(self, contract):
-        self.ib.qualifyContracts(contract)
-        [ticker] = await self.ib.reqTickersAsync(contract)
-        price = ticker.marketPrice() if ticker.marketPrice() is not None else ticker.close
-        return contract.symbol, price
+    @staticmethod
+    def get_short_put_positions(portfolio):
+        ''' Rows of the portfolio that are short put options (vectorized mask, no iterrows).'''
+        rights = portfolio['contract'].map(attrgetter('right')).to_numpy()
+        pos = portfolio['position'].to_numpy()
+        mask = (rights == 'P') & (pos < 0)
+        return portfolio.loc[mask].reset_index(drop=True)
+
+    @staticmethod
+    def _lookup_prices(symbols, prices):
+        ''' Price per row of `symbols` (NaN if unpriced): one dict lookup per unique symbol, rows via NumPy indexing.'''
+        lookup = np.array([*prices.values(), np.nan], dtype=np.float64)
+        idx = pd.Index(list(prices)).get_indexer(symbols.to_numpy())
+        return lookup[idx]
+
+    async def fetch_prices_async(self, contracts):
+        ''' Qualify and price all contracts in one batched request each. Returns {symbol: price}.'''
+        if not contracts:
+            return {}
+        await self.ib.qualifyContractsAsync(*contracts)
+        tickers = await self.ib.reqTickersAsync(*contracts)
+        return {t.contract.symbol: (t.marketPrice() if t.marketPrice() is not None else t.close) for t in tickers}
 
     async def get_short_put_exposure_async(self, exclude_ETFs=True):
         ''' Function that retrieves short put exposure data.
@@ -42,39 +90,19 @@ class RiskManager:
         Output: DataFrame with short put exposure data and a dictionary with total exposure, exposure at risk and expected dollar return.
         '''
         self.portfolio = self.get_portfolio_data()
+        short_put_df = self.get_short_put_positions(self.portfolio)
 
-        put_option_rows = [row for _, row in self.portfolio.iterrows() if row['contract'].right == 'P' and np.sign(row['position']) == -1]
-        short_put_df = pd.DataFrame(put_option_rows)
-
-        def get_sector(symbol, source='yf' or 'universe'):
-            if source == 'yf':
-                info = yf.Ticker(symbol).info
-                try:
-                    sector = info['sector']
-                    return sector
-                except KeyError:
-                    return None
-            elif source == 'universe':
-                if symbol in self.uni['Symbol'].values:
-                    sector = self.uni.loc[self.uni['Symbol'] == symbol, 'Sector'].values[0]
-                    return sector
-                else:
-                    return None
-
-        short_put_df['sector'] = short_put_df['symbol'].apply(lambda x: get_sector(x, source='universe'))
+        short_put_df['sector'] = short_put_df['symbol'].map(self._sector_map)
 
         if exclude_ETFs:
             short_put_df = short_put_df[short_put_df['sector'].notna()].reset_index(drop=True)
 
-        contracts = [Stock(symbol, 'SMART', 'USD') for symbol in short_put_df['symbol'].unique()]
-        tasks = [self.fetch_price_async(con) for con in contracts]
-        prices = await asyncio.gather(*tasks)
-
-        prices_dict = dict(prices)
-        short_put_df['stockprice'] = short_put_df['symbol'].map(prices_dict)
-        short_put_df['strike'] = short_put_df['contract'].apply(lambda x: x.strike)
+        contracts = [_stock(symbol) for symbol in short_put_df['symbol'].unique()]
+        prices_dict = await self.fetch_prices_async(contracts)
+        short_put_df['stockprice'] = self._lookup_prices(short_put_df['symbol'], prices_dict)
+        short_put_df['strike'] = [c.strike for c in short_put_df['contract']]
         short_put_df['exposure_level1'] = abs(short_put_df['position']) * short_put_df['strike'] * 100
-        short_put_df['exposure_level2'] = np.where(short_put_df['strike'] >= short_put_df['stockprice'] * 0.95, short_put_df['exposure_level1'], 0)
+        short_put_df['exposure_level2'] = short_put_df['exposure_level1'] * (short_put_df['strike'].to_numpy() >= short_put_df['stockprice'].to_numpy() * 0.95)
         short_put_df['expected_dollar_return'] = np.where(short_put_df['strike'] <= short_put_df['stockprice'], abs(short_put_df['marketValue']), short_put_df['marketValue'] + (short_put_df['averageCost']))
 
         self.short_put_df = short_put_df[['contract', 'symbol', 'sector', 'strike', 'stockprice', 'position', 'marketValue', 'averageCost', 'exposure_level1', 'exposure_level2', 'expected_dollar_return']]
@@ -87,48 +115,27 @@ class RiskManager:
         Output: DataFrame with short put exposure data and a dictionary with total exposure, exposure at risk and expected dollar return.'''
 
         self.portfolio = self.get_portfolio_data()
+        short_put_df = self.get_short_put_positions(self.portfolio)
 
-        put_option_rows = [row for _,row in self.portfolio.iterrows() if row['contract'].right == 'P' and np.sign(row['position']) == -1]
-        short_put_df = pd.DataFrame(put_option_rows)
-
-        def get_sector(symbol, source='yf' or 'universe'):
-            if source == 'yf':
-                info = yf.Ticker(symbol).info
-                try:
-                    sector = info['sector']
-                    return sector
-                except KeyError:
-                    return None
-            elif source == 'universe':
-                # Check if the symbol exists in the DataFrame
-                if symbol in self.uni['Symbol'].values:
-                    sector = self.uni.loc[self.uni['Symbol'] == symbol, 'Sector'].values[0]
-                    return sector
-                else:
-                    return None
-        
-        short_put_df['sector'] = short_put_df['symbol'].apply(lambda x: get_sector(x,source='universe'))
+        short_put_df['sector'] = short_put_df['symbol'].map(self._sector_map)
         
         if exclude_ETFs:
             short_put_df = short_put_df[short_put_df['sector'].notna()].reset_index(drop=True)
         
+        # Qualify and request tickers for all underlyings at once (no per-symbol round trip + sleep)
+        contracts = [_stock(symbol) for symbol in short_put_df['symbol'].unique()]
         prices = {}
-        for symbol in short_put_df['symbol'].unique():
-            # Create Stock contract
-            contract = Stock(symbol, 'SMART', 'USD')
-            self.ib.qualifyContracts(contract)
-            [ticker] = self.ib.reqTickers(contract)
-
-            price = ticker.marketPrice() if ticker.marketPrice() is not None else ticker.close
-            prices[symbol] = price
-            
-            self.ib.sleep(0.1)
+        if contracts:
+            self.ib.qualifyContracts(*contracts)
+            for ticker in self.ib.reqTickers(*contracts):
+                price = ticker.marketPrice() if ticker.marketPrice() is not None else ticker.close
+                prices[ticker.contract.symbol] = price
 
         # Map prices to the stocks_only dataframe
-        short_put_df['stockprice'] = short_put_df['symbol'].map(prices)
-        short_put_df['strike'] = short_put_df['contract'].apply(lambda x: x.strike)
+        short_put_df['stockprice'] = self._lookup_prices(short_put_df['symbol'], prices)
+        short_put_df['strike'] = [c.strike for c in short_put_df['contract']]
         short_put_df['exposure_level1'] = abs(short_put_df['position']) * short_put_df['strike'] * 100
-        short_put_df['exposure_level2'] = np.where(short_put_df['strike'] >= short_put_df['stockprice']*0.95, short_put_df['exposure_level1'], 0)
+        short_put_df['exposure_level2'] = short_put_df['exposure_level1'] * (short_put_df['strike'].to_numpy() >= short_put_df['stockprice'].to_numpy()*0.95)
         short_put_df['expected_dollar_return'] = np.where(short_put_df['strike'] <= short_put_df['stockprice'], abs(short_put_df['marketValue']), short_put_df['marketValue'] + (short_put_df['averageCost']))
 
         self.short_put_df =short_put_df[['contract','symbol','sector','strike','stockprice','position','marketValue','averageCost','exposure_level1','exposure_level2','expected_dollar_return']]
@@ -144,55 +151,39 @@ class RiskManager:
 
     def analyze_sector_exposure(self):
         portfolio = self.get_portfolio_data()
-        sector_exposure = {}
-        total_value = 0
-
-        for _, row in portfolio[portfolio['asset_class'] == Stock].iterrows():
-            contract = row['contract']
-            contract = Stock(contract.symbol, 'SMART', contract.currency)
-            print(contract)
-            sector = self.get_sector_from_contract(contract)
-            position_value = row['position'] * row['marketPrice']
-            
-            if sector not in sector_exposure:
-                sector_exposure[sector] = 0
-            sector_exposure[sector] += position_value
-            total_value += position_value
+        stocks = portfolio[portfolio['asset_class'] == Stock]
 
-        # Calculate percentage exposure for each sector
-        for sector in sector_exposure:
-            sector_exposure[sector] = (sector_exposure[sector] / total_value) * 100
+        # Universe lookup for all rows at once, IB/Yahoo fallback only once per unknown symbol
+        sectors = stocks['symbol'].map(self._sector_map)
+        missing = stocks.loc[sectors.isna(), ['symbol', 'contract']].drop_duplicates('symbol')
+        fallback = {sym: self.get_sector_from_contract(_stock(sym, con.currency))
+                    for sym, con in zip(missing['symbol'], missing['contract'])}
+        if fallback:
+            sectors = sectors.fillna(stocks['symbol'].map(fallback))
 
-        # Sort sectors by exposure percentage in descending order
-        sorted_exposure = sorted(sector_exposure.items(), key=lambda x: x[1], reverse=True)
+        position_value = stocks['position'] * stocks['marketPrice']
+        sector_value = position_value.groupby(sectors.rename('Sector'), dropna=False).sum()
 
-        # Create a DataFrame for better visualization
-        exposure_df = pd.DataFrame(sorted_exposure, columns=['Sector', 'Exposure (%)'])
-        exposure_df.set_index('Sector', inplace=True)
+        # Percentage exposure per sector, sorted in descending order
+        exposure_df = (sector_value / sector_value.sum() * 100).sort_values(ascending=False).to_frame('Exposure (%)')
 
         return exposure_df
             
     def get_sector_from_contract(self,contract):
         ''' Function that tries to retrieve sector information. Starts with ArcticDB, then tries to retrieve data from IB and Yahoo Finance as a fallback.'''
         def get_sector_from_uni(contract):
-            try:
-                sector = self.uni[self.uni.Symbol==contract.symbol].Sector.values[0]
-                return sector
-            except:
-                return None
+            return self._sector_map.get(contract.symbol)
         
         def get_isin_from_contract(contract):
             import xml.etree.ElementTree as ET
             fundamentals = self.ib.reqFundamentalData(contract, reportType='ReportSnapshot')
             root = ET.fromstring(fundamentals)
+            # Single pass: the ISIN is the element directly following the one holding the symbol
+            prev_elem = None
             for elem in root.iter():
-                prev_elem = None
-                for elem in root.iter():
-                    if prev_elem is not None:
-                        if prev_elem.text == contract.symbol:
-                            isin = elem.text
-                            return isin
-                    prev_elem = elem
+                if prev_elem is not None and prev_elem.text == contract.symbol:
+                    return elem.text
+                prev_elem = elem
 
         def get_sector_from_yf(contract):
             try:
@@ -240,68 +231,161 @@ class RiskManager:
 
     def get_clean_contract(self, contract):
         if isinstance(contract, Stock):
-            contract = type(contract)(symbol=contract.symbol, exchange='SMART', currency=contract.currency)
+            contract = _stock(contract.symbol, contract.currency)
         return contract
     
 
-    def get_historical_data(self, contract, duration='1 Y', bar_size='1 day'):
+    @staticmethod
+    def _duration_to_timedelta(duration):
+        ''' Convert an IB duration string ('30 D', '2 W', '6 M', '1 Y') to a timedelta.'''
+        n, unit = duration.split()
+        days_per_unit = {'S': 1 / 86400, 'D': 1, 'W': 7, 'M': 31, 'Y': 366}
+        return timedelta(days=int(n) * days_per_unit[unit.upper()])
+
+    async def get_historical_data_async(self, contract, duration='1 Y', bar_size='1 day'):
+        ''' Historical ADJUSTED_LAST bars indexed by date, cached in the 'hist_bars' ArcticDB library.
+        Only the bars since the last cached one (plus HIST_OVERLAP_DAYS of overlap) are requested from IB; the
+        overlap is compared with the cache, and a mismatch (adjustment basis changed after a split/dividend)
+        rewrites the symbol from a full request. The result covers `duration`.'''
+        if not isinstance(contract, (Stock, Option)):
+            raise ValueError(f"Historical data only supported for Stock/Option contracts, got {type(contract).__name__}")
         if isinstance(contract, Stock):
+            contract = _stock(contract.symbol, contract.currency)
+        else:
             contract = type(contract)(symbol=contract.symbol, exchange='SMART', currency=contract.currency)
-            bars = self.ib.reqHistoricalData(contract, endDateTime='', durationStr=duration,
-                                        barSizeSetting=bar_size, whatToShow='ADJUSTED_LAST', useRTH=True)
-        if isinstance(contract, Option):
-            contract = type(contract)(symbol=contract.symbol, exchange='SMART', currency=contract.currency)
-            bars = self.ib.reqHistoricalData(contract, endDateTime='', durationStr=duration,
-                                    barSizeSetting=bar_size, whatToShow='ADJUSTED_LAST', useRTH=True)
-        return pd.DataFrame(bars)
-
-    def calculate_position_correlations(self):
-        spy = Stock('SPY', 'SMART', 'USD')
-        tlt = Stock('TLT', 'SMART', 'USD')
 
-        spy_data = self.get_historical_data(spy)
-        tlt_data = self.get_historical_data(tlt)
+        # ArcticDB calls are blocking: run them in worker threads so batched requests overlap
+        lib = await asyncio.to_thread(self.arctic.get_library, 'hist_bars', create_if_missing=True)
+        key = self._hist_key(contract, duration, bar_size)
+        window = pd.Timedelta(self._duration_to_timedelta(duration))
+
+        cached = await asyncio.to_thread(lambda: lib.read(key).data if lib.has_symbol(key) else None)
+        last = cached.index[-1] if cached is not None and not cached.empty else None
+        data = None
+        if last is not None and pd.Timestamp.now(tz=last.tz) - last < window:
+            # Incremental request: the days since the last cached bar plus an overlap to check the adjustment basis
+            delta_days = (pd.Timestamp.now(tz=last.tz) - last).days + 1 + self.HIST_OVERLAP_DAYS
+            bars = await self.ib.reqHistoricalDataAsync(contract, endDateTime='', durationStr=f'{delta_days} D',
+                                                        barSizeSetting=bar_size, whatToShow='ADJUSTED_LAST', useRTH=True)
+            new_data = self._bars_to_frame(bars)
+            if new_data.empty:
+                data = cached
+            else:
+                # The last cached bar may have been a partial session, so it is not compared
+                overlap = new_data.index.intersection(cached.index[:-1])
+                if len(overlap) and not np.allclose(new_data.loc[overlap, 'close'].to_numpy(dtype=np.float64),
+                                                    cached.loc[overlap, 'close'].to_numpy(dtype=np.float64),
+                                                    rtol=1e-6, equal_nan=True):
+                    print(f"Adjusted history changed for {contract.symbol}, requesting full history")
+                else:
+                    # update() replaces the cached rows in the new bars' date range (incl. the last cached bar)
+                    await asyncio.to_thread(lib.update, key, new_data)
+                    data = pd.concat([cached[cached.index < new_data.index[0]], new_data])
+        if data is None:
+            bars = await self.ib.reqHistoricalDataAsync(contract, endDateTime='', durationStr=duration,
+                                                        barSizeSetting=bar_size, whatToShow='ADJUSTED_LAST', useRTH=True)
+            data = self._bars_to_frame(bars)
+            if not data.empty:
+                await asyncio.to_thread(lib.write, key, data)
+
+        if data.empty:
+            return data
+        return data[data.index >= pd.Timestamp.now(tz=data.index.tz) - window]
+
+    @staticmethod
+    def _hist_key(contract, duration, bar_size):
+        return f"{contract.symbol}_{contract.secType}_{contract.currency}_{duration}_{bar_size}".replace(' ', '')
+
+    @staticmethod
+    def _bars_to_frame(bars):
+        data = util.df(bars)
+        if data is None or data.empty:
+            return pd.DataFrame()
+        data['date'] = pd.to_datetime(data['date'])
+        return data.set_index('date')
+
+    async def get_historical_data_batch_async(self, contracts, duration='1 Y', bar_size='1 day'):
+        ''' Fetch historical data for several contracts concurrently.
+        Returns a list aligned with `contracts` holding a DataFrame or the Exception raised for that contract.'''
+        # One request per cache key, even if several positions share an underlying
+        unique = {}
+        for c in contracts:
+            key = self._hist_key(c, duration, bar_size) if isinstance(c, (Stock, Option)) else id(c)
+            unique.setdefault(key, c)
+        results = await asyncio.gather(*(self.get_historical_data_async(c, duration, bar_size) for c in unique.values()),
+                                       return_exceptions=True)
+        by_key = dict(zip(unique.keys(), results))
+        return [by_key[self._hist_key(c, duration, bar_size) if isinstance(c, (Stock, Option)) else id(c)] for c in contracts]
 
-        spy_returns = spy_data['close'].pct_change().dropna()
-        tlt_returns = tlt_data['close'].pct_change().dropna()
+    def get_historical_data(self, contract, duration='1 Y', bar_size='1 day'):
+        return self.ib.run(self.get_historical_data_async(contract, duration, bar_size))
 
-        correlations = {}
+    def calculate_position_correlations(self):
+        spy = _stock('SPY')
+        tlt = _stock('TLT')
 
         # Get the portfolio positions
-        portfolio = pd.DataFrame(self.ib.portfolio())
-        portfolio['symbol'] = portfolio['contract'].apply(lambda x: x.symbol)
+        portfolio = self._portfolio_frame()
+        portfolio['symbol'] = [c.symbol for c in portfolio['contract'].to_numpy()]
+
+        # All historical data in one concurrent batch (served from ArcticDB where cached)
+        spy_data, tlt_data, *position_data = self.ib.run(
+            self.get_historical_data_batch_async([spy, tlt] + list(portfolio['contract'])))
+        if isinstance(spy_data, Exception) or isinstance(tlt_data, Exception):
+            raise spy_data if isinstance(spy_data, Exception) else tlt_data
+        portfolio['hist_data'] = position_data
 
-        for _, row in portfolio.iterrows():
+        # Benchmarks aligned once; all positions are then correlated against them in one NumPy pass
+        bench = pd.concat([spy_data['close'], tlt_data['close']], axis=1, join='inner', keys=['SPY', 'TLT']).pct_change().dropna()
+
+        returns, signs = {}, {}
+        for symbol, position, hist_data in zip(portfolio['symbol'], portfolio['position'], portfolio['hist_data']):
             try:
-                contract = row['contract']
-                hist_data = self.get_historical_data(contract)
-                returns = hist_data['close'].pct_change().dropna()
-                
-                aligned_data = pd.concat([returns, spy_returns, tlt_returns], axis=1, join='inner')
-                aligned_data.columns = ['asset', 'SPY', 'TLT']
-                
-                corr_spy = aligned_data['asset'].corr(aligned_data['SPY'])
-                corr_tlt = aligned_data['asset'].corr(aligned_data['TLT'])
-                
-                position_sign = np.sign(row['position'])
-                correlations[row['symbol']] = {
-                    'SPY': corr_spy * position_sign,
-                    'TLT': corr_tlt * position_sign}
+                if isinstance(hist_data, Exception):
+                    raise hist_data
+                # Contracts without ADJUSTED_LAST bars (e.g. illiquid options) come back as an empty frame
+                if hist_data.empty or 'close' not in hist_data.columns:
+                    raise ValueError("no historical data")
+                returns[symbol] = hist_data['close'].pct_change().dropna()
+                signs[symbol] = np.sign(position)
             except Exception as e:
-                print(f"Error processing {row['symbol']}: {str(e)}")
-        if not correlations:
+                print(f"Error processing {symbol}: {str(e)}")
+
+        if not returns:
             print("No correlations were calculated. Check the contracts and data availability.")
             return None
         else:
-            corr_df = pd.DataFrame(correlations).T
-            corr_df.columns = ['Equity-like (SPY)', 'Bond-like (TLT)']
+            R = pd.concat(returns, axis=1).reindex(bench.index)
+            sign = np.fromiter(signs.values(), dtype=np.float64, count=len(signs))
+            corr = self._masked_corr(R.to_numpy(), bench.to_numpy()) * sign[:, None]
+            corr_df = pd.DataFrame(corr, index=R.columns, columns=['Equity-like (SPY)', 'Bond-like (TLT)'])
             corr_df['Character'] = np.where(corr_df['Equity-like (SPY)'].abs() > corr_df['Bond-like (TLT)'].abs(), 'Equity-like', 'Bond-like')
             return corr_df
 
+    @staticmethod
+    def _masked_corr(R, B):
+        ''' Pearson correlation of every column of R (T x N, NaN where a position has no bar) with every
+        column of B (T x K, complete), each pair over the rows where the R column is present. Returns N x K.'''
+        mask = ~np.isnan(R)
+        n = mask.sum(axis=0)[:, None].astype(np.float64)
+        X = np.where(mask, R, 0.0)
+        sx = X.sum(axis=0)[:, None]
+        sxx = (X * X).sum(axis=0)[:, None]
+        sy = mask.T @ B
+        syy = mask.T @ (B * B)
+        sxy = X.T @ B
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx * sx / n
+            var_y = syy - sy * sy / n
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[n[:, 0] < 2] = np.nan
+        return corr
+
     def analyze_portfolio_character(self):
         self.corr_df = self.calculate_position_correlations()
-        portfolio = pd.DataFrame(self.ib.portfolio())
-        portfolio['symbol'] = portfolio['contract'].apply(lambda x: x.symbol)
+        portfolio = self._portfolio_frame()
+        portfolio['symbol'] = [c.symbol for c in portfolio['contract'].to_numpy()]
         
         portfolio_analysis = portfolio.merge(self.corr_df, left_on='symbol', right_index=True, how='left')
         total_market_value = portfolio_analysis['marketValue'].abs().sum()
@@ -1,11 +1,50 @@
 # ATS/broker/trademanager.py
 from ib_async import *
 import time
+from copy import copy
+
+ACK_STATUSES = {'PreSubmitted', 'Submitted', 'Filled'}  # order states that mean IB has accepted the order
 
 class TradeManager:
     def __init__(self, ib_client,strategy_manager):
         self.ib = ib_client
         self.strategy_manager = strategy_manager
+        self._qualified = {}  # contracts qualified during this session, keyed by _qualify_key
+
+    @staticmethod
+    def _qualify_key(contract):
+        ''' Cache key for a contract: its conId once known, otherwise its identifying fields.'''
+        if contract.conId:
+            return contract.conId
+        return (contract.secType, contract.symbol, contract.localSymbol, contract.lastTradeDateOrContractMonth,
+                contract.strike, contract.right, contract.multiplier, contract.exchange,
+                contract.primaryExchange, contract.currency)
+
+    def _qualify(self, *contracts):
+        ''' Qualify contracts in place, skipping the IB round trip for contracts already qualified this session.'''
+        pending = []
+        for contract in contracts:
+            cached = self._qualified.get(self._qualify_key(contract))
+            if cached is not None:
+                util.dataclassUpdate(contract, cached)
+            else:
+                pending.append(contract)
+
+        if pending:
+            keys = [self._qualify_key(contract) for contract in pending]
+            self.ib.qualifyContracts(*pending)
+            for key, contract in zip(keys, pending):
+                if contract.conId:
+                    self._qualified[key] = self._qualified[contract.conId] = copy(contract)
+
+    def _wait_for_ack(self, trade, timeout=1.0):
+        ''' Wait until IB acknowledges the order (or it is done), but at most `timeout` seconds.'''
+        deadline = time.monotonic() + timeout
+        while trade.orderStatus.status not in ACK_STATUSES and not trade.isDone():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.ib.waitOnUpdate(timeout=remaining)
 
     def trade(self, contract, quantity, order_type='MKT', algo = True, urgency='Patient', orderRef="", limit=None, useRth = False):
         """
@@ -16,7 +55,7 @@ class TradeManager:
         :param urgency: 'Patient' (default), 'Normal', 'Urgent'
         :param limit: if order_type 'LMT' state limit as float
         """
-        self.ib.qualifyContracts(contract)
+        self._qualify(contract)
         
         # Create order object
         action = 'BUY' if quantity > 0 else 'SELL'
@@ -43,8 +82,7 @@ class TradeManager:
 
         # Place the order
         trade = self.ib.placeOrder(contract, order)
-        time.sleep(1)
-        self.ib.sleep(1)
+        self._wait_for_ack(trade)
 
         # Notify the strategy manager about the order placement
         self.strategy_manager.message_queue.put({
@@ -66,7 +104,7 @@ class TradeManager:
             :param orderRef: Reference identifier for the order.
         """
         # Qualify contracts
-        self.ib.qualifyContracts(current_contract,new_contract)
+        self._qualify(current_contract, new_contract)
 
         # Define quantity based on current position
         quantity = [pos.position for pos in self.ib.portfolio() if pos.contract.localSymbol==current_contract.localSymbol][0]
@@ -19,14 +19,12 @@ def get_isin_from_contract(contract, ib=None):
         ib = connect_to_IB(clientid=77)
     fundamentals = ib.reqFundamentalData(contract, reportType='ReportSnapshot')
     root = ET.fromstring(fundamentals)
+    # Single pass: the ISIN is the element directly following the one holding the symbol
+    prev_elem = None
     for elem in root.iter():
-        prev_elem = None
-        for elem in root.iter():
-            if prev_elem is not None:
-                if prev_elem.text == contract.symbol:
-                    isin = elem.text
-                    return isin
-            prev_elem = elem
+        if prev_elem is not None and prev_elem.text == contract.symbol:
+            return elem.text
+        prev_elem = elem
     
 def get_last_full_trading_day(current_datetime=None):
     # Create NYSE calendar
@@ -95,8 +95,12 @@ async def scrape_data():
         df['Market Cap'] = df['Market Cap'].apply(clean_market_cap_and_price)
         df['Volume'] = df['Volume'].apply(clean_volume)
 
-        # Save cleaned data to CSV
+        # Save cleaned data to CSV (and Parquet for the download job, if pyarrow is installed)
         df.to_csv("univ_us_equities.csv")
+        try:
+            df.to_parquet("univ_us_equities.parquet", compression="zstd")
+        except ImportError as e:
+            print(f"Skipping Parquet universe: {e}")
         
         # Optionally close the browser
         await browser.close()
@@ -62,14 +62,18 @@ for sector in univ_df['Sector'].unique().tolist():
     df['ATR'] = df.groupby('Symbol').apply(lambda group: talib.ATR(group['High'], group['Low'], group['Close'], timeperiod=20)).reset_index(level=0, drop=True)
     df['STD'] = df.groupby('Symbol')['Close'].rolling(window=20).std().reset_index(level=0, drop=True)
 
-    df['KC_Upper'] = df.groupby('Symbol').apply(lambda x: x['20D_EMA'] + (x['ATR'] * 1.5)).shift(1).reset_index(level=0, drop=True)  # Upper Keltner Channel
-    df['KC_Lower'] = df.groupby('Symbol').apply(lambda x: x['20D_EMA'] - (x['ATR'] * 1.5)).shift(1).reset_index(level=0, drop=True)  # Lower Keltner Channel
+    # Channels use the previous bar's values: shift the inputs per symbol (no apply/lambda per group)
+    shifted = df.groupby('Symbol', sort=False)[['20D_EMA', 'ATR', 'STD']].shift(1)
 
-    df['DC_Upper'] = df.groupby('Symbol')['High'].rolling(window=20).max().shift(1).reset_index(level=0, drop=True)  # Upper Donchian Channel
-    df['DC_Lower'] = df.groupby('Symbol')['Low'].rolling(window=20).min().shift(1).reset_index(level=0, drop=True)  # Lower Donchian Channel
+    df['KC_Upper'] = shifted['20D_EMA'] + (shifted['ATR'] * 1.5)  # Upper Keltner Channel
+    df['KC_Lower'] = shifted['20D_EMA'] - (shifted['ATR'] * 1.5)  # Lower Keltner Channel
 
-    df['BB_Upper'] = df.groupby('Symbol').apply(lambda x: x['20D_EMA'] + (x['STD'] * 2)).shift(1).reset_index(level=0, drop=True) # Upper Bollinger Band
-    df['BB_Lower'] = df.groupby('Symbol').apply(lambda x: x['20D_EMA'] - (x['STD'] * 2)).shift(1).reset_index(level=0, drop=True) # Lower Bollinger Band
+    # df is sorted by Symbol, so the grouped rolling results line up with its rows
+    df['DC_Upper'] = df.groupby('Symbol', sort=False)['High'].rolling(window=20).max().groupby(level=0, sort=False).shift(1).to_numpy()  # Upper Donchian Channel
+    df['DC_Lower'] = df.groupby('Symbol', sort=False)['Low'].rolling(window=20).min().groupby(level=0, sort=False).shift(1).to_numpy()  # Lower Donchian Channel
+
+    df['BB_Upper'] = shifted['20D_EMA'] + (shifted['STD'] * 2)  # Upper Bollinger Band
+    df['BB_Lower'] = shifted['20D_EMA'] - (shifted['STD'] * 2)  # Lower Bollinger Band
 
     # Daily Returns for later aggregation & comparing among sectors
     # df['log_ret_1d'] = df.groupby('Symbol')['Close'].apply(lambda x: np.log(x.shift(-1) / x))
@@ -1,7 +1,11 @@
 import numpy as np
 import pandas as pd
 import yfinance as yf
+import contextlib
 import datetime
+import logging
+import multiprocessing as mp
+import os
 import time
 from pathlib import Path
 import warnings
@@ -20,16 +24,48 @@ except ImportError:
             print(f"{desc} (Total: {total})")
         return iterable
 
+# Numba is optional: without it the indicators fall back to pandas groupby operations
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+    prange = range
+
+# PyArrow is only needed for the opt-in Parquet outputs
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
 # Suppress specific FutureWarnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 BASE_DIR = Path(__file__).resolve().parent
 UNIV_CSV_PATH = BASE_DIR / "univ_us_equities.csv"
+UNIV_PARQUET_PATH = BASE_DIR / "univ_us_equities.parquet"
 SECTOR_OUTPUT_DIR = BASE_DIR / "output" / "sectors"
 SYMBOL_OUTPUT_DIR = BASE_DIR / "output" / "symbols"
+CACHE_DIR = BASE_DIR / "cache"  # per-symbol downloaded history (parquet)
+OHLCV_FIELDS = ["Open", "High", "Low", "Close", "Volume"]  # downloaded fields, all published in the outputs
+DOWNLOAD_CHUNK_SIZE = 150  # symbols per yf.download call
+DOWNLOAD_RETRIES = 4  # exponential backoff attempts for symbols that came back without data
+DOWNLOAD_PAUSE_SECS = 3  # delay between chunks to stay under Yahoo's rate limit
+MAX_WORKERS = 8  # upper bound on sectors processed in parallel
+MAX_CONCURRENT_DOWNLOADS = 2  # sector processes downloading from Yahoo at the same time
+CACHE_OVERLAP_DAYS = 7  # calendar days re-downloaded before the last cached bar to detect adjustments
+
+# Semaphore shared by the worker processes limiting concurrent downloads (None when running serially)
+_download_slots = None
 
 SECTOR_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 SYMBOL_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def sanitize_filename(value: str) -> str:
@@ -38,7 +74,7 @@ def sanitize_filename(value: str) -> str:
 
 
 def load_universe(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path, index_col=0)
+    df = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path, index_col=0)
     df = df[["Symbol", "Name", "Sector", "Market Cap"]].dropna(subset=["Symbol", "Sector"])
     df["Symbol"] = df["Symbol"].astype(str).str.upper().str.strip()
     df["Name"] = df["Name"].astype(str).str.strip()
@@ -48,164 +84,595 @@ def load_universe(path: Path) -> pd.DataFrame:
     return df
 
 
-def download_sector_data(symbols) -> pd.DataFrame:
-    cleaned_symbols = sorted({sym.strip().upper() for sym in symbols if isinstance(sym, str) and sym.strip()})
-    if not cleaned_symbols:
-        return pd.DataFrame()
-        
-    try:
-        # If too many symbols, break into smaller chunks to avoid rate limits
-        if len(cleaned_symbols) > 50:
-            print(f"Breaking {len(cleaned_symbols)} symbols into smaller chunks to avoid rate limits")
-            chunks = [cleaned_symbols[i:i + 30] for i in range(0, len(cleaned_symbols), 30)]
-            all_data = []
-            
-            for i, chunk in enumerate(chunks):
-                print(f"Downloading chunk {i+1}/{len(chunks)} ({len(chunk)} symbols)")
-                chunk_data = yf.download(
-                    tickers=chunk,
-                    group_by="Ticker",
-                    period="max",
-                    auto_adjust=True,
-                    threads=True,
-                )
-                if not chunk_data.empty:
-                    all_data.append(chunk_data)
-                # Add delay between chunks to avoid rate limits
-                if i < len(chunks) - 1:  # Don't wait after last chunk
-                    time.sleep(3)  # 3 second delay between chunks
-                    
-            # Combine chunks if we got any data
-            if all_data:
-                data = pd.concat(all_data, axis=1)
-            else:
-                return pd.DataFrame()
-        else:
+def _is_rate_limited(error) -> bool:
+    """True for a rate-limit exception or a logged yfinance error message."""
+    message = str(error).lower()
+    return (type(error).__name__ == "YFRateLimitError" or "rate limit" in message
+            or "too many requests" in message or "429" in message)
+
+
+class _YFErrorLog(logging.Handler):
+    """Collects the per-ticker failures yfinance logs (instead of raising) during one yf.download call."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _download_chunk(chunk, **kwargs) -> pd.DataFrame:
+    """
+    yf.download for one chunk, reshaped by _stack_download.
+    yfinance reports per-ticker failures (rate limiting included) as missing or all-NaN columns and a logged
+    error instead of raising, so tickers without a single Close are requested again with exponential backoff.
+    Backoff continues while Yahoo reports rate limiting (or the whole chunk comes back blank); otherwise a
+    retry that recovers nothing ends early, the remaining tickers are unavailable (delisted/unknown).
+    """
+    frames = []
+    missing = list(chunk)
+    yf_logger = logging.getLogger("yfinance")
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        if attempt:
+            delay = 5 * 2 ** (attempt - 1)
+            print(f"{len(missing)} symbol(s) returned no data, retrying in {delay}s ({attempt}/{DOWNLOAD_RETRIES})")
+            time.sleep(delay)
+        errors = _YFErrorLog()
+        yf_logger.addHandler(errors)
+        try:
             data = yf.download(
-                tickers=cleaned_symbols,
+                tickers=missing,
                 group_by="Ticker",
-                period="max",
                 auto_adjust=True,
                 threads=True,
+                **kwargs,
             )
+        except Exception as e:
+            if _is_rate_limited(e) and attempt < DOWNLOAD_RETRIES:
+                continue
+            if not frames:
+                raise
+            # Keep what already downloaded; the rest is reported as missing below
+            print(f"Error downloading data: {e}")
+            break
+        finally:
+            yf_logger.removeHandler(errors)
+
+        recovered = set()
+        if not data.empty:
+            stacked = _stack_download(data, missing)
+            recovered = set(stacked.loc[stacked['Close'].notna(), 'Symbol'])
+            if recovered:
+                frames.append(stacked[stacked['Symbol'].isin(recovered)])
+        # A chunk that has not returned a single symbol yet counts as throttled even without a logged error
+        throttled = not frames or any(_is_rate_limited(message) for message in errors.messages)
+        missing = [sym for sym in missing if sym not in recovered]
+        if not missing or (attempt and not throttled):
+            break
+
+    if missing:
+        print(f"No data for {len(missing)} symbol(s): {', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+    return pd.concat(frames, axis=0) if frames else pd.DataFrame()
+
+
+def _yf_download(symbols, **kwargs) -> pd.DataFrame:
+    """
+    yf.download for a list of symbols in chunks of DOWNLOAD_CHUNK_SIZE; kwargs select the date range.
+    Returns a long frame indexed by Date with a Symbol column; each chunk is reshaped as it arrives.
+    """
+    # yf.download already spreads a chunk over its own threads, so chunks can be large
+    chunks = [symbols[i:i + DOWNLOAD_CHUNK_SIZE] for i in range(0, len(symbols), DOWNLOAD_CHUNK_SIZE)]
+
+    long_chunks = []
+    for i, chunk in enumerate(chunks):
+        if len(chunks) > 1:
+            print(f"Downloading chunk {i+1}/{len(chunks)} ({len(chunk)} symbols)")
+        chunk_data = _download_chunk(chunk, **kwargs)
+        if not chunk_data.empty:
+            long_chunks.append(chunk_data)
+        # Add delay between chunks to avoid rate limits (sectors download in parallel)
+        if i < len(chunks) - 1:
+            time.sleep(DOWNLOAD_PAUSE_SECS)
+
+    return pd.concat(long_chunks, axis=0) if long_chunks else pd.DataFrame()
+
+
+def _stack_download(data: pd.DataFrame, symbols) -> pd.DataFrame:
+    """Wide yf.download result -> long frame of OHLCV_FIELDS indexed by Date with a Symbol column."""
+    if isinstance(data.columns, pd.MultiIndex):
+        # Drop any extra fields before reshaping: less data moved through stack/concat/groupby
+        data = data.loc[:, (slice(None), OHLCV_FIELDS)]
+        return data.stack(level=0).rename_axis(['Date', 'Symbol']).reset_index(level=1)
+    stacked = data[OHLCV_FIELDS].copy()
+    stacked['Symbol'] = symbols[0]
+    return stacked.rename_axis('Date')
+
+
+def _cache_path(symbol: str) -> Path:
+    return CACHE_DIR / f"{sanitize_filename(symbol)}.parquet"
+
+
+def _read_cache(symbol: str):
+    path = _cache_path(symbol)
+    if not path.exists():
+        return None
+    try:
+        cached = pd.read_parquet(path)
+        # Caches written while only High/Low/Close were kept lack Open/Volume: download those symbols again
+        if cached.empty or not set(OHLCV_FIELDS).issubset(cached.columns):
+            return None
+        return cached[OHLCV_FIELDS]
     except Exception as e:
-        print(f"Error downloading data: {e}")
-        return pd.DataFrame()
+        print(f"Warning: Could not read cache for {symbol}: {e}")
+        return None
+
+
+def _write_cache(symbol: str, data: pd.DataFrame) -> None:
+    try:
+        data.to_parquet(_cache_path(symbol))
+    except Exception as e:
+        print(f"Warning: Could not write cache for {symbol}: {e}")
+
 
-    if data.empty:
+def download_sector_data(symbols) -> pd.DataFrame:
+    """
+    Daily history for all symbols, served from the per-symbol parquet cache in CACHE_DIR.
+    Cached symbols only fetch the bars from CACHE_OVERLAP_DAYS before their last cached date on (symbols
+    sharing a start date are downloaded together); a symbol whose overlapping bars no longer match
+    (adjusted history changed after a split/dividend) is downloaded again in full.
+    """
+    cleaned_symbols = sorted({sym.strip().upper() for sym in symbols if isinstance(sym, str) and sym.strip()})
+    if not cleaned_symbols:
         return pd.DataFrame()
 
-    if isinstance(data.columns, pd.MultiIndex):
-        stacked = data.stack(level=0).rename_axis(['Date', 'Symbol']).reset_index(level=1)
-    else:
-        stacked = data.copy()
-        stacked['Symbol'] = cleaned_symbols[0]
-        stacked = stacked.rename_axis('Date')
+    cached = {sym: frame for sym in cleaned_symbols if (frame := _read_cache(sym)) is not None}
 
-    return stacked
+    # Batches keyed by start date; None = full history
+    batches = {}
+    for sym in cleaned_symbols:
+        start = (cached[sym].index.max() - pd.Timedelta(days=CACHE_OVERLAP_DAYS)).strftime('%Y-%m-%d') if sym in cached else None
+        batches.setdefault(start, []).append(sym)
+    if len(cached):
+        print(f"{len(cached)}/{len(cleaned_symbols)} symbols cached, {len(batches)} download batch(es)")
+
+    downloaded = {}
+
+    def fetch(batch, start):
+        kwargs = {'period': 'max'} if start is None else {'start': start}
+        try:
+            data = _yf_download(batch, **kwargs)
+        except Exception as e:
+            print(f"Error downloading data: {e}")
+            return
+        if data.empty:
+            return
+        for sym, frame in data.groupby('Symbol', sort=False):
+            downloaded[sym] = frame.drop(columns='Symbol')
+
+    for start, batch in batches.items():
+        fetch(batch, start)
+
+    # Adjusted prices shift on splits/dividends: the overlapping bars must match the cache.
+    # The last cached bar is left out, it may have been cached before the session closed
+    stale = []
+    for sym, frame in cached.items():
+        new = downloaded.get(sym)
+        if new is None or new.empty:
+            continue
+        overlap = new.index.intersection(frame.index[:-1])
+        if len(overlap) and not np.allclose(new.loc[overlap, 'Close'].to_numpy(dtype=float),
+                                            frame.loc[overlap, 'Close'].to_numpy(dtype=float), rtol=1e-6, equal_nan=True):
+            stale.append(sym)
+    if stale:
+        print(f"Adjusted history changed for {len(stale)} cached symbol(s), downloading full history")
+        for sym in stale:
+            cached.pop(sym)
+            downloaded.pop(sym, None)
+        fetch(stale, None)
+
+    frames = []
+    for sym in cleaned_symbols:
+        old, new = cached.get(sym), downloaded.get(sym)
+        if new is None or new.empty:
+            data = old
+        else:
+            data = new if old is None else pd.concat([old, new])
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            _write_cache(sym, data)
+        if data is not None:
+            frames.append(data.assign(Symbol=sym))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).rename_axis('Date')
+
+
+WINDOW = 20                             # ATR / STD / Donchian lookback
+EMA_SPANS = (20, 50, 200)
+RETURN_PERIODS = {'1M': 21, '3M': 63, '6M': 126, '12M': 252, '1d': 1}
+PRICE_INDICATORS = [*RETURN_PERIODS, *(f'{span}D_EMA' for span in EMA_SPANS), 'ATR', 'STD', 'DC_Upper', 'DC_Lower']
+INDICATOR_VERSION = 2  # bump whenever the price indicator definitions change; invalidates the indicator cache
+INDICATOR_LOOKBACK = 300  # rows of context recomputed before a symbol's new bars (> longest window, 252)
+
+
+@njit(cache=True)
+def _ema(x, span, seed, out):
+    # Same recursion as pandas ewm(span, adjust=False), including NaN gaps. A non-NaN seed is the
+    # known EMA value at x[0] (resuming a cached series), otherwise the recursion starts at x[0]
+    alpha = 2.0 / (span + 1.0)
+    weighted = seed if seed == seed else x[0]
+    out[0] = weighted
+    old_wt = 1.0
+    for i in range(1, x.shape[0]):
+        cur = x[i]
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+
+
+@njit(cache=True)
+def _pct_change(x, periods, padded, out):
+    # pandas pct_change(periods): forward-filled prices (written to `padded`), NaN for the first `periods` bars
+    last = np.nan
+    for i in range(x.shape[0]):
+        if x[i] == x[i]:
+            last = x[i]
+        padded[i] = last
+        out[i] = padded[i] / padded[i - periods] - 1.0 if i >= periods else np.nan
+
+
+@njit(cache=True)
+def _nanmax(a, b):
+    # Larger of two float64 values, ignoring a NaN operand (like np.fmax)
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a > b else b
+
+
+@njit(cache=True)
+def _true_range(high, low, close, out):
+    # max(H - L, |H - prev C|, |L - prev C|), skipping NaN terms. Inputs may be float32:
+    # every term is widened to float64 so the comparisons see a single type
+    for i in range(close.shape[0]):
+        h = np.float64(high[i])
+        l = np.float64(low[i])
+        tr = abs(h - l)
+        if i > 0:
+            prev_close = np.float64(close[i - 1])
+            tr = _nanmax(tr, _nanmax(abs(h - prev_close), abs(l - prev_close)))
+        out[i] = tr
+
+
+@njit(cache=True)
+def _rolling_mean(x, window, out):
+    # Running sum; like pandas rolling(window).mean() a value needs `window` non-NaN inputs
+    total = 0.0
+    count = 0
+    for i in range(x.shape[0]):
+        if x[i] == x[i]:
+            total += x[i]
+            count += 1
+        if i >= window and x[i - window] == x[i - window]:
+            total -= x[i - window]
+            count -= 1
+        out[i] = total / window if count == window else np.nan
+
+
+@njit(cache=True)
+def _rolling_std(x, window, out):
+    # Sample standard deviation over full windows of non-NaN values, O(1) per bar: running sum and
+    # sum of squares of (x - shift), the shift (first valid value) keeps the subtraction well conditioned
+    shift = np.nan
+    for i in range(x.shape[0]):
+        if x[i] == x[i]:
+            shift = x[i]
+            break
+    s1 = 0.0
+    s2 = 0.0
+    count = 0
+    for i in range(x.shape[0]):
+        if x[i] == x[i]:
+            d = x[i] - shift
+            s1 += d
+            s2 += d * d
+            count += 1
+        if i >= window and x[i - window] == x[i - window]:
+            d = x[i - window] - shift
+            s1 -= d
+            s2 -= d * d
+            count -= 1
+        if count == window:
+            var = (s2 - s1 * s1 / window) / (window - 1)
+            out[i] = np.sqrt(var) if var > 0.0 else 0.0
+        else:
+            out[i] = np.nan
+
+
+@njit(cache=True)
+def _shifted_rolling_extreme(x, window, is_max, dq, out):
+    # Donchian bound: rolling max/min over full windows of non-NaN values, shifted by one bar.
+    # Monotonic deque of indices in `dq` (values decreasing for max, increasing for min), amortized O(1) per bar
+    n = x.shape[0]
+    head = 0
+    tail = 0
+    last_nan = -1
+    out[0] = np.nan
+    for i in range(n - 1):
+        v = x[i]
+        if v != v:
+            last_nan = i
+        else:
+            while tail > head and ((x[dq[tail - 1]] <= v) if is_max else (x[dq[tail - 1]] >= v)):
+                tail -= 1
+            dq[tail] = i
+            tail += 1
+        while tail > head and dq[head] <= i - window:
+            head += 1
+        if i + 1 >= window and last_nan <= i - window:
+            out[i + 1] = x[dq[head]]
+        else:
+            out[i + 1] = np.nan
+
+
+@njit(cache=True, parallel=True)
+def _indicator_kernel(close, high, low, offsets, periods, spans, ema_seeds, returns, emas, atr, std, dc_upper,
+                      dc_lower, scratch, dq):
+    ''' Fills all price indicators in one pass per symbol; rows of a symbol are contiguous (offsets[g]:offsets[g+1]).
+    ema_seeds[g, k] resumes EMA k of group g (NaN = start from the first close).
+    All outputs and the scratch buffers (float32 / int64, one slot per row) are preallocated by the caller.'''
+    for g in prange(offsets.shape[0] - 1):
+        s, e = offsets[g], offsets[g + 1]
+        c, h, l, tmp = close[s:e], high[s:e], low[s:e], scratch[s:e]
+        for k in range(periods.shape[0]):
+            _pct_change(c, periods[k], tmp, returns[k, s:e])
+        for k in range(spans.shape[0]):
+            _ema(c, spans[k], ema_seeds[g, k], emas[k, s:e])
+        _true_range(h, l, c, tmp)
+        _rolling_mean(tmp, WINDOW, atr[s:e])
+        _rolling_std(c, WINDOW, std[s:e])
+        _shifted_rolling_extreme(h, WINDOW, True, dq[s:e], dc_upper[s:e])
+        _shifted_rolling_extreme(l, WINDOW, False, dq[s:e], dc_lower[s:e])
+
+
+def _group_offsets(symbols: np.ndarray) -> np.ndarray:
+    """Start row of every contiguous Symbol block, plus the total row count."""
+    return np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1], True])
+
+
+def _price_indicators_numba(close, high, low, offsets, ema_seeds=None) -> dict:
+    n = close.shape[0]
+    if ema_seeds is None:
+        ema_seeds = np.full((len(offsets) - 1, len(EMA_SPANS)), np.nan)
+
+    # Every output and scratch buffer allocated once for the whole frame and filled in place.
+    # float32 storage halves memory traffic; the kernels accumulate in float64 scalars
+    returns = np.empty((len(RETURN_PERIODS), n), dtype=np.float32)
+    emas = np.empty((len(EMA_SPANS), n), dtype=np.float32)
+    atr, std, dc_upper, dc_lower, scratch = (np.empty(n, dtype=np.float32) for _ in range(5))
+    dq = np.empty(n, dtype=np.int64)
+    periods = np.array(list(RETURN_PERIODS.values()), dtype=np.int64)
+    spans = np.array(EMA_SPANS, dtype=np.int64)
+    _indicator_kernel(close, high, low, offsets, periods, spans, ema_seeds, returns, emas, atr, std, dc_upper,
+                      dc_lower, scratch, dq)
+
+    out = dict(zip(RETURN_PERIODS, returns))
+    out.update({f'{span}D_EMA': ema for span, ema in zip(EMA_SPANS, emas)})
+    out.update({'ATR': atr, 'STD': std, 'DC_Upper': dc_upper, 'DC_Lower': dc_lower})
+    return out
+
+
+def _indicator_cache_path(symbol: str) -> Path:
+    return CACHE_DIR / f"{sanitize_filename(symbol)}_ind_v{INDICATOR_VERSION}.parquet"
+
+
+def _cached_price_indicators(df: pd.DataFrame) -> dict:
+    """
+    Price indicators (numba path) reusing each symbol's indicator cache from the previous run.
+    A symbol whose cached rows still match its history (same dates, closes, highs and lows) only recomputes its new
+    bars, with INDICATOR_LOOKBACK rows of context and the EMAs resumed from the cached values, so the
+    result matches a full recomputation (up to float32 rounding of the resumed EMA). Other symbols are
+    computed in full; new results are cached.
+    """
+    close = df['Close'].to_numpy(dtype=np.float32)
+    high = df['High'].to_numpy(dtype=np.float32)
+    low = df['Low'].to_numpy(dtype=np.float32)
+    symbols = df['Symbol'].to_numpy()
+    offsets = _group_offsets(symbols)
+    ema_cols = [f'{span}D_EMA' for span in EMA_SPANS]
+
+    # Per symbol: cached rows to reuse, and the row range [start, e) to compute
+    plans = []
+    for g in range(len(offsets) - 1):
+        s, e = offsets[g], offsets[g + 1]
+        symbol = symbols[s]
+        cached, n_cached = None, 0
+        path = _indicator_cache_path(symbol)
+        if path.exists():
+            try:
+                cached = pd.read_parquet(path)
+                m = min(len(cached), e - s)
+                # NaN bars (common in yfinance output) count as unchanged; High/Low feed ATR and Donchian
+                if (m and df.index[s:s + m].equals(cached.index[:m])
+                        and all(np.array_equal(cached[col].to_numpy(dtype=np.float32)[:m], prices[s:s + m], equal_nan=True)
+                                for col, prices in (('Close', close), ('High', high), ('Low', low)))):
+                    n_cached = m
+            except Exception as e_read:
+                print(f"Warning: Could not read indicator cache for {symbol}: {e_read}")
+        start = s + max(0, n_cached - INDICATOR_LOOKBACK)
+        seeds = cached[ema_cols].iloc[start - s].to_numpy(dtype=np.float64) if start > s else np.full(len(EMA_SPANS), np.nan)
+        plans.append((symbol, s, e, n_cached, start, seeds, cached))
+
+    todo = [plan for plan in plans if plan[3] < plan[2] - plan[1]]
+    out = {col: np.empty(len(df), dtype=np.float32) for col in PRICE_INDICATORS}
+
+    # Cached rows first
+    for symbol, s, e, n_cached, start, seeds, cached in plans:
+        if n_cached:
+            for col in PRICE_INDICATORS:
+                out[col][s:s + n_cached] = cached[col].to_numpy(dtype=np.float32)[:n_cached]
+
+    # Everything else in one kernel call over the concatenated row ranges
+    if todo:
+        rows = np.concatenate([np.arange(start, e) for _, _, e, _, start, _, _ in todo])
+        work_offsets = np.r_[0, np.cumsum([e - start for _, _, e, _, start, _, _ in todo])]
+        work = _price_indicators_numba(close[rows], high[rows], low[rows], work_offsets,
+                                       np.vstack([seeds for *_, seeds, _ in todo]))
+        for (symbol, s, e, n_cached, start, _, _), w0 in zip(todo, work_offsets[:-1]):
+            # Rows before s + n_cached only served as lookback context
+            skip = s + n_cached - start
+            for col in PRICE_INDICATORS:
+                out[col][s + n_cached:e] = work[col][w0 + skip:w0 + e - start]
+            frame = pd.DataFrame({'Close': close[s:e], 'High': high[s:e], 'Low': low[s:e],
+                                  **{col: out[col][s:e] for col in PRICE_INDICATORS}},
+                                 index=df.index[s:e])
+            try:
+                frame.to_parquet(_indicator_cache_path(symbol))
+            except Exception as e_write:
+                print(f"Warning: Could not write indicator cache for {symbol}: {e_write}")
+
+    if plans and len(todo) < len(plans):
+        print(f"Indicator cache: {len(plans) - len(todo)}/{len(plans)} symbols unchanged, {len(todo)} (re)computed")
+    return out
+
+
+def _price_indicators_pandas(df: pd.DataFrame) -> dict:
+    symbols = df['Symbol'].to_numpy()
+    by_symbol = df.groupby('Symbol', sort=False)
+    close_by_symbol = by_symbol['Close']
+
+    def shift_within(values):
+        return pd.Series(values).groupby(symbols, sort=False).shift(1).to_numpy()
+
+    # Returns on prices forward-filled within the symbol (the old pct_change default, dropped in pandas 3)
+    padded_by_symbol = close_by_symbol.ffill().groupby(symbols, sort=False)
+    out = {name: padded_by_symbol.pct_change(periods, fill_method=None).to_numpy() for name, periods in RETURN_PERIODS.items()}
+    for span in EMA_SPANS:
+        out[f'{span}D_EMA'] = close_by_symbol.ewm(span=span, adjust=False).mean().to_numpy()
+
+    # True range over the whole frame at once; the previous close comes from the same symbol
+    high = df['High'].to_numpy()
+    low = df['Low'].to_numpy()
+    prev_close = close_by_symbol.shift(1).to_numpy()
+    # fmax skips NaN like the row-wise max did, so a symbol's first bar keeps TR = High - Low
+    tr = np.fmax(np.abs(high - low), np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    out['ATR'] = pd.Series(tr).groupby(symbols, sort=False).rolling(window=WINDOW).mean().to_numpy()
+    out['STD'] = close_by_symbol.rolling(window=WINDOW).std().to_numpy()
+    out['DC_Upper'] = shift_within(by_symbol['High'].rolling(window=WINDOW).max().to_numpy())
+    out['DC_Lower'] = shift_within(by_symbol['Low'].rolling(window=WINDOW).min().to_numpy())
+    return out
 
 
 def compute_indicators(df: pd.DataFrame, symbol_to_name, symbol_to_sector, symbol_to_mktcap) -> pd.DataFrame:
     if df.empty:
         return df
-        
-    # Make sure we have a clean index without duplicates
-    df = df.sort_index()
-    
-    # Check for and handle duplicate indices
-    if df.index.duplicated().any():
-        print(f"Warning: Found {df.index.duplicated().sum()} duplicate index entries. Using first occurrence.")
-        df = df[~df.index.duplicated(keep='first')]
-    
-    # Add metadata columns
-    df["Name"] = df["Symbol"].map(symbol_to_name)
-    df["Sector"] = df["Symbol"].map(symbol_to_sector)
-    df["Market Cap"] = df["Symbol"].map(symbol_to_mktcap)
+
+    # Rows ordered by Symbol then Date: every symbol is one contiguous block, so per-symbol
+    # results can be assigned positionally
+    df = df.rename_axis('Date').sort_values(['Symbol', 'Date'], kind='stable')
+
+    # Check for and handle duplicate (Date, Symbol) rows
+    duplicated = pd.MultiIndex.from_arrays([df.index, df['Symbol']]).duplicated()
+    if duplicated.any():
+        print(f"Warning: Found {duplicated.sum()} duplicate (Date, Symbol) entries. Using first occurrence.")
+        df = df[~duplicated]
+
+    # Add metadata columns: one dict lookup per unique symbol, rows filled through the factorized codes
+    codes, uniques = pd.factorize(df["Symbol"])
+    df["Name"] = np.array([symbol_to_name.get(sym) for sym in uniques], dtype=object)[codes]
+    df["Sector"] = np.array([symbol_to_sector.get(sym) for sym in uniques], dtype=object)[codes]
+    df["Market Cap"] = np.array([symbol_to_mktcap.get(sym, np.nan) for sym in uniques], dtype=np.float64)[codes]
+
+    # All per-symbol price indicators in one fused pass (pandas groupby fallback without numba,
+    # or when the kernel fails to compile/run). The numba path works on float32 copies of
+    # High/Low/Close; the published OHLC columns keep their float64 values
+    ind = None
+    if HAVE_NUMBA:
+        try:
+            ind = _cached_price_indicators(df)
+        except Exception as e:
+            print(f"Warning: numba indicator kernel failed ({e}), falling back to pandas")
+    if ind is None:
+        ind = _price_indicators_pandas(df)
 
     # Calculate price change periods
-    df['1M'] = df.groupby('Symbol')['Close'].pct_change(21)
-    df['3M'] = df.groupby('Symbol')['Close'].pct_change(63)
-    df['6M'] = df.groupby('Symbol')['Close'].pct_change(126)
-    df['12M'] = df.groupby('Symbol')['Close'].pct_change(252)
-    
+    for col in ('1M', '3M', '6M', '12M'):
+        df[col] = ind[col]
+
     # Calculate RS indicators
     df['RS IBD'] = 2 * df['3M'] + df['6M'] + df['12M']
     
     # Handle potential issues with rank calculation
     try:
-        df['RS Rank'] = df.groupby(df.index)['RS IBD'].rank(pct=True)
-        df["RS Rank 20D MA"] = df.groupby("Symbol")["RS Rank"].transform(lambda x: x.rolling(window=20).mean())
+        # Per-date percentile rank on the long frame, grouped by factorized date codes
+        # (a dense date x symbol matrix costs GBs for long histories of large sectors)
+        date_codes, _ = pd.factorize(df.index)
+        df['RS Rank'] = df['RS IBD'].groupby(date_codes).rank(pct=True).to_numpy()
+        df["RS Rank 20D MA"] = df.groupby("Symbol", sort=False)["RS Rank"].rolling(window=WINDOW).mean().to_numpy()
     except Exception as e:
         print(f"Warning: Error calculating RS Rank: {e}")
         df['RS Rank'] = np.nan
         df['RS Rank 20D MA'] = np.nan
 
-    # Calculate EMAs using pandas ewm
-    df["20D_EMA"] = df.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=20, adjust=False).mean())
-    df["50D_EMA"] = df.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=50, adjust=False).mean())
-    df["200D_EMA"] = df.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=200, adjust=False).mean())
+    for col in ('20D_EMA', '50D_EMA', '200D_EMA', 'ATR', 'STD'):
+        df[col] = ind[col]
 
-    # Calculate ATR for each symbol directly
-    df_with_tr = df.copy()
-    
-    # Calculate true range components for each symbol
-    for symbol in df_with_tr['Symbol'].unique():
-        mask = df_with_tr['Symbol'] == symbol
-        high = df_with_tr.loc[mask, 'High']
-        low = df_with_tr.loc[mask, 'Low']
-        close = df_with_tr.loc[mask, 'Close']
-        
-        # Calculate true range
-        tr1 = (high - low).abs()
-        tr2 = (high - close.shift()).abs()
-        tr3 = (low - close.shift()).abs()
-        
-        # Get maximum of the three
-        df_with_tr.loc[mask, 'TR'] = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    # Now calculate ATR using transform for each symbol
-    df['ATR'] = df_with_tr.groupby('Symbol')['TR'].transform(lambda x: x.rolling(window=20).mean())
-    df['STD'] = df.groupby('Symbol')['Close'].rolling(window=20).std().reset_index(level=0, drop=True)
+    # Channels use the previous bar's EMA/ATR/STD: shift the three inputs once (per symbol),
+    # then build the four bands from the shifted arrays
+    shifted = df.groupby('Symbol', sort=False)[['20D_EMA', 'ATR', 'STD']].shift(1)
+    ema_s = shifted['20D_EMA'].to_numpy()
+    atr_s = shifted['ATR'].to_numpy()
+    std_s = shifted['STD'].to_numpy()
 
-    # Calculate Keltner Channels directly
-    df['KC_Upper_raw'] = df['20D_EMA'] + (df['ATR'] * 1.5)
-    df['KC_Lower_raw'] = df['20D_EMA'] - (df['ATR'] * 1.5)
-    
-    # Apply shift by symbol
-    df['KC_Upper'] = df.groupby('Symbol')['KC_Upper_raw'].transform(lambda x: x.shift(1))
-    df['KC_Lower'] = df.groupby('Symbol')['KC_Lower_raw'].transform(lambda x: x.shift(1))
-    
-    # Drop intermediate columns
-    df = df.drop(['KC_Upper_raw', 'KC_Lower_raw'], axis=1)
+    # Keltner Channels
+    df['KC_Upper'] = ema_s + atr_s * 1.5
+    df['KC_Lower'] = ema_s - atr_s * 1.5
 
-    df['DC_Upper'] = df.groupby('Symbol')['High'].rolling(window=20).max().shift(1).reset_index(level=0, drop=True)
-    df['DC_Lower'] = df.groupby('Symbol')['Low'].rolling(window=20).min().shift(1).reset_index(level=0, drop=True)
+    df['DC_Upper'] = ind['DC_Upper']
+    df['DC_Lower'] = ind['DC_Lower']
 
-    # Calculate Bollinger Bands directly
-    df['BB_Upper_raw'] = df['20D_EMA'] + (df['STD'] * 2)
-    df['BB_Lower_raw'] = df['20D_EMA'] - (df['STD'] * 2)
-    
-    # Apply shift by symbol
-    df['BB_Upper'] = df.groupby('Symbol')['BB_Upper_raw'].transform(lambda x: x.shift(1))
-    df['BB_Lower'] = df.groupby('Symbol')['BB_Lower_raw'].transform(lambda x: x.shift(1))
-    
-    # Drop intermediate columns
-    df = df.drop(['BB_Upper_raw', 'BB_Lower_raw'], axis=1)
+    # Bollinger Bands
+    df['BB_Upper'] = ema_s + std_s * 2
+    df['BB_Lower'] = ema_s - std_s * 2
 
-    df['1d'] = df.groupby('Symbol')['Close'].pct_change(1)
+    df['1d'] = ind['1d']
 
-    df.sort_index(inplace=True)
+    # Rows stay ordered by Symbol then Date (the order save_outputs writes)
     return df
 
 
-def save_outputs(sector: str, df: pd.DataFrame) -> None:
+def _write_csv(df: pd.DataFrame, path: Path) -> None:
+    # DataFrame.to_csv keeps the published format (unquoted header, "1.0" floats, YYYY-MM-DD dates);
+    # pyarrow's CSV writer renders all three differently
+    df.to_csv(path, index=False)
+
+
+def _write_output(df: pd.DataFrame, path: Path, parquet: bool) -> None:
+    """Write df to `path` + .csv, or + .parquet (zstd, dictionary-encoded strings) when requested and pyarrow is available."""
+    # Append the extension rather than with_suffix(): symbols such as BRK.B contain dots
+    if parquet and HAVE_PYARROW:
+        df.to_parquet(path.with_name(f"{path.name}.parquet"), engine="pyarrow", compression="zstd", index=False)
+    else:
+        _write_csv(df, path.with_name(f"{path.name}.csv"))
+
+
+def save_outputs(sector: str, df: pd.DataFrame, parquet: bool = False) -> None:
     if df.empty:
         print(f"Warning: Empty dataframe for sector {sector}, no files will be saved.")
         return
         
     try:
         sector_filename = sanitize_filename(sector)
-        sector_output_path = SECTOR_OUTPUT_DIR / f"{sector_filename}.csv"
+        sector_output_path = SECTOR_OUTPUT_DIR / sector_filename
 
         # Reset index and prepare for output
         output_df = df.reset_index()
@@ -214,78 +681,110 @@ def save_outputs(sector: str, df: pd.DataFrame) -> None:
         if 'index' in output_df.columns:
             output_df = output_df.rename(columns={'index': 'Date'})
         
-        # Sort for consistency
-        output_df = output_df.sort_values(['Symbol', 'Date'])
+        # compute_indicators already returns rows ordered by Symbol then Date
 
         # Save sector data
-        print(f"Writing sector data to {sector_output_path}")
-        output_df.to_csv(sector_output_path, index=False)
+        print(f"Writing sector data for {sector} to {SECTOR_OUTPUT_DIR}")
+        _write_output(output_df, sector_output_path, parquet)
 
         # Save individual symbol data
-        symbols_in_data = sorted(output_df['Symbol'].unique())
-        for symbol in tqdm(symbols_in_data, desc=f"Writing {sector} symbols", leave=False):
-            symbol_data = output_df[output_df['Symbol'] == symbol]
-            if symbol_data.empty:
-                continue
-            symbol_output_path = SYMBOL_OUTPUT_DIR / f"{symbol}.csv"
-            symbol_data.to_csv(symbol_output_path, index=False)
+        symbol_groups = output_df.groupby('Symbol', sort=False)
+        for symbol, symbol_data in tqdm(symbol_groups, total=symbol_groups.ngroups, desc=f"Writing {sector} symbols", leave=False):
+            _write_output(symbol_data, SYMBOL_OUTPUT_DIR / symbol, parquet)
     except Exception as e:
         print(f"Error saving outputs for sector {sector}: {e}")
 
 
+def _init_worker(download_slots) -> None:
+    """Pool initializer: the processes already use the cores, so each numba kernel runs single-threaded."""
+    global _download_slots
+    _download_slots = download_slots
+    if HAVE_NUMBA:
+        import numba
+        numba.set_num_threads(1)
+
+
+def process_sector(sector: str, sector_symbols, symbol_to_name, symbol_to_sector, symbol_to_mktcap, parquet: bool = False) -> None:
+    """Download, compute indicators and write outputs for one sector (runs in a worker process)."""
+    try:
+        print(f'{datetime.datetime.now()}: Downloading {sector} data', flush=True)
+
+        # Skip empty sectors
+        if not sector_symbols:
+            print(f"No symbols found for sector: {sector}, skipping.", flush=True)
+            return
+
+        with _download_slots or contextlib.nullcontext():
+            sector_data = download_sector_data(sector_symbols)
+        if sector_data.empty:
+            print(f"{datetime.datetime.now()}: No data returned for {sector}, skipping.", flush=True)
+            return
+
+        print(f'{datetime.datetime.now()}: {sector} data downloaded. Continue with indicator calculations.', flush=True)
+
+        # Process the data to add indicators
+        sector_data = compute_indicators(sector_data, symbol_to_name, symbol_to_sector, symbol_to_mktcap)
+        
+        # Save the processed data
+        save_outputs(sector, sector_data, parquet)
+
+        print(f'{datetime.datetime.now()}: {sector} data written to {"Parquet" if parquet else "CSV"} files', flush=True)
+        
+    except Exception as e:
+        print(f"Error processing sector {sector}: {e}", flush=True)
+
+
 def main():
-    print(f"{datetime.datetime.now()}: Loading universe from CSV")
+    # Usage: 3_download_us_stock_data_to_csv.py [sector] [--parquet]   (--parquet writes Parquet instead of CSV)
+    args = [arg for arg in sys.argv[1:] if arg != "--parquet"]
+    parquet = "--parquet" in sys.argv[1:]
+
+    # Prefer the Parquet universe when it is at least as recent as the CSV
+    univ_path = UNIV_CSV_PATH
+    if UNIV_PARQUET_PATH.exists() and (not UNIV_CSV_PATH.exists() or UNIV_PARQUET_PATH.stat().st_mtime >= UNIV_CSV_PATH.stat().st_mtime):
+        univ_path = UNIV_PARQUET_PATH
+    print(f"{datetime.datetime.now()}: Loading universe from {univ_path.name}")
     try:
-        univ_df = load_universe(UNIV_CSV_PATH)
+        univ_df = load_universe(univ_path)
     except Exception as e:
         print(f"Error loading universe: {e}")
         return
 
-    symbol_to_name = dict(zip(univ_df["Symbol"], univ_df["Name"]))
-    symbol_to_sector = dict(zip(univ_df["Symbol"], univ_df["Sector"]))
-    symbol_to_mktcap = dict(zip(univ_df["Symbol"], univ_df["Market Cap"]))
-
     # Get unique sectors, handling potential NaN values safely
     sectors = sorted(univ_df['Sector'].dropna().unique())
     
     # Optional: allow processing just one sector for testing
     selected_sector = None
-    if len(sys.argv) > 1:
-        selected_sector = sys.argv[1]
+    if args:
+        selected_sector = args[0]
         if selected_sector in sectors:
             print(f"Processing only sector: {selected_sector}")
             sectors = [selected_sector]
         else:
             print(f"Warning: Sector '{selected_sector}' not found in universe. Processing all sectors.")
-    
-    for sector in sectors:
-        try:
-            print(f'{datetime.datetime.now()}: Downloading {sector} data')
-            sector_symbols = univ_df.loc[univ_df.Sector == sector, 'Symbol'].tolist()
-            
-            # Skip empty sectors
-            if not sector_symbols:
-                print(f"No symbols found for sector: {sector}, skipping.")
-                continue
-
-            sector_data = download_sector_data(sector_symbols)
-            if sector_data.empty:
-                print(f"{datetime.datetime.now()}: No data returned for {sector}, skipping.")
-                continue
 
-            print(f'{datetime.datetime.now()}: {sector} data downloaded. Continue with indicator calculations.')
-
-            # Process the data to add indicators
-            sector_data = compute_indicators(sector_data, symbol_to_name, symbol_to_sector, symbol_to_mktcap)
-            
-            # Save the processed data
-            save_outputs(sector, sector_data)
-
-            print(f'{datetime.datetime.now()}: {sector} data written to CSV files')
-            
-        except Exception as e:
-            print(f"Error processing sector {sector}: {e}")
-            continue
+    # One task per sector, each carrying only its own symbols' metadata
+    tasks = []
+    for sector, sector_df in univ_df[univ_df['Sector'].isin(sectors)].groupby('Sector', sort=True):
+        tasks.append((
+            sector,
+            sector_df['Symbol'].tolist(),
+            dict(zip(sector_df["Symbol"], sector_df["Name"])),
+            dict(zip(sector_df["Symbol"], sector_df["Sector"])),
+            dict(zip(sector_df["Symbol"], sector_df["Market Cap"])),
+            parquet,
+        ))
+
+    # Sectors are independent: process them in parallel so downloads overlap with indicator work
+    n_workers = min(MAX_WORKERS, os.cpu_count() or 1, len(tasks))
+    if n_workers <= 1:
+        for task in tasks:
+            process_sector(*task)
+    else:
+        print(f"{datetime.datetime.now()}: Processing {len(tasks)} sectors with {n_workers} worker processes")
+        download_slots = mp.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        with mp.Pool(n_workers, initializer=_init_worker, initargs=(download_slots,)) as pool:
+            pool.starmap(process_sector, tasks)
 
 
 if __name__ == "__main__":
@@ -142,20 +142,34 @@ class Strategy:
                     )
                     
                     if not opportunities.empty:
-                        # Process opportunities
-                        for _, opt in opportunities.iterrows():
-                            # Skip if we already have a position
-                            if opt['Symbol'] in self.current_positions.index:
-                                continue
-                                
+                        # Account values are fetched once per cycle, not per opportunity
+                        summary = self.get_account_values('EquityWithLoanValue', 'InitMarginReq')
+                        equity = summary['EquityWithLoanValue']
+                        current_margin = summary['InitMarginReq']
+
+                        # Skip symbols we already have a position in
+                        opps = [opt for opt in opportunities.itertuples(index=False)
+                                if opt.Symbol not in self.current_positions.index]
+
+                        # Request all what-if margins concurrently
+                        what_ifs = await self.what_if_orders(opps)
+
+                        # Process opportunities. The what-ifs are all priced against the same account
+                        # snapshot, so accepted orders are added to the running margin / sector totals
+                        sector_exposure = defaultdict(float, self.sector_exposure)
+                        for opt, what_if in zip(opps, what_ifs):
                             # Check margin and sector limits
-                            if await self.check_position_limits(opt):
+                            accepted = self.check_position_limits(opt, what_if, equity, current_margin, sector_exposure)
+                            if accepted:
+                                new_margin, sector = accepted
+                                current_margin += new_margin
+                                sector_exposure[sector] += new_margin / equity
                                 trade = self.place_order(
-                                    opt['Contract'],
-                                    qty=-abs(opt['position']),
+                                    opt.Contract,
+                                    qty=-abs(opt.position),
                                     ordertype='LMT',
-                                    limit_price=opt['Bid'],
-                                    orderRef=f"PEA_OSS_{opt['Symbol']}"
+                                    limit_price=opt.Bid,
+                                    orderRef=f"PEA_OSS_{opt.Symbol}"
                                 )
                 
                 # Check hedging opportunities
@@ -183,35 +197,44 @@ class Strategy:
         trade.statusEvent += self.on_status_change
         return trade
 
-    async def check_position_limits(self, opportunity):
-        """Check all position limits before placing a trade"""
+    def get_account_values(self, *tags):
+        """Sum the numeric account summary values for the given tags in a single accountSummary() call"""
+        values = dict.fromkeys(tags, 0.0)
+        for v in self.ib.accountSummary():
+            if v.tag in values:
+                values[v.tag] += float(v.value)
+        return values
+
+    async def what_if_orders(self, opportunities):
+        """Run the what-if margin checks for all opportunities in one gather; failed requests map to None"""
+        orders = [MarketOrder('SELL', abs(opt.position)) for opt in opportunities]
+        what_ifs = await asyncio.gather(
+            *[self.ib.whatIfOrderAsync(opt.Contract, order) for opt, order in zip(opportunities, orders)],
+            return_exceptions=True
+        )
+        return [None if isinstance(w, Exception) else w for w in what_ifs]
+
+    def check_position_limits(self, opportunity, what_if, equity, current_margin, sector_exposure):
+        """Check all position limits before placing a trade; returns (new_margin, sector) if accepted, else None"""
         # Check margin requirements
-        equity = sum(float(v.value) for v in self.ib.accountSummary() 
-                    if v.tag == "EquityWithLoanValue")
-        
-        order = MarketOrder('SELL', abs(opportunity['position']))
-        what_if = await self.ib.whatIfOrderAsync(opportunity['Contract'], order)
-        
         if what_if is None:
-            return False
+            return None
             
         new_margin = float(what_if.initMarginChange)
-        current_margin = sum(float(v.value) for v in self.ib.accountSummary() 
-                           if v.tag == "InitMarginReq")
         
         # Check limits
         if (new_margin > equity * self.max_position_margin or
             (current_margin + new_margin) > equity * self.max_total_margin):
-            return False
+            return None
             
         # Check sector exposure
         sector = self.strategy_manager.risk_manager.get_sector_from_contract(
-            Stock(opportunity['Symbol'], 'SMART', 'USD'))
+            Stock(opportunity.Symbol, 'SMART', 'USD'))
         
-        if (self.sector_exposure[sector] + new_margin/equity) > self.max_sector_exposure:
-            return False
+        if (sector_exposure[sector] + new_margin/equity) > self.max_sector_exposure:
+            return None
             
-        return True
+        return new_margin, sector
 
     def disconnect(self):
         """Disconnect from IB"""